@@ -16,13 +16,125 @@ def gauss(x, y, p, sig):
     ## The Gaussian is defined so that its shift can be easily controled by the coordinates of the points
     return 1 / (2 * np.pi * sig**2) * np.exp(-((x - p[0])**2 + (y - p[1])**2) / (2 * sig**2))
 
-def add_points(points, sig, N):
+def _gauss_1d(u, c, sig):
     """
-    Adds Gaussians to points on input and generates a map of values
+    One dimensional factor of the Gaussian, the 2D Gaussian is a product of two of these
+
+    Parameters:
+        u (numpy.ndarray) - coordinates along one axis
+        c (numpy.ndarray) - coordinates of the origins along the same axis
+        sig (float) - standard deviation
+    """
+    return np.exp(-(u[None, :] - c[:, None])**2 / (2 * sig**2))
+
+def render_loop(points, sig, x, y):
+    """
+    Reference rendering, evaluates the full Gaussian on the whole mesh for every point
+
+    Parameters:
+        points (numpy.ndarray) - input points
+        sig (float) - standard deviation of added Gaussians
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+    """
+    xx, yy = np.meshgrid(x, y)
+
+    map = np.zeros_like(xx)
+
+    # Adds a Gaussian for each point and tracks a count of the Gaussians added, since the program from main.py can run quite long
+    i = 0
+    for p in points:
+        i+=100
+        map += gauss(xx, yy, p, sig)
+        print(f'Adding Gaussians to point mesh: {round(i/points.shape[0],2)} %', end = '\r')
+    return map
+
+def render_separable(points, sig, x, y, chunk=2048):
+    """
+    Rendering based on the separability of the Gaussian, exp(-(dx^2+dy^2)) = exp(-dx^2)*exp(-dy^2), so the whole map is
+    a single matrix product of the (P, N) y-factors with the (P, N) x-factors. Equal to render_loop up to rounding (rtol ~1e-12)
 
     Parameters:
         points (numpy.ndarray) - input points
         sig (float) - standard deviation of added Gaussians
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+        chunk (int) - number of points in one matrix product, bounds the memory of the factors to chunk*N
+    """
+    map = np.zeros((len(y), len(x)))
+    for s in range(0, points.shape[0], chunk):
+        p = points[s:s + chunk]
+        map += _gauss_1d(y, p[:, 1], sig).T @ _gauss_1d(x, p[:, 0], sig)
+    map *= 1 / (2 * np.pi * sig**2)
+    return map
+
+def render_stencil(points, sig, x, y, cutoff=6, chunk=4096):
+    """
+    Rendering that only evaluates each Gaussian on a square stencil of pixels that contains all pixels closer than cutoff*sig
+    to its point. The truncated tail of every Gaussian is smaller than exp(-cutoff^2/2) of its peak, so the absolute
+    difference to render_loop is at most (number of overlapping points) * exp(-cutoff^2/2) / (2*pi*sig^2), for the default
+    cutoff=6 that is ~1.5e-8 of one peak
+
+    Parameters:
+        points (numpy.ndarray) - input points
+        sig (float) - standard deviation of added Gaussians
+        x (numpy.ndarray) - x coordinates of the map, must be evenly spaced
+        y (numpy.ndarray) - y coordinates of the map, must be evenly spaced
+        cutoff (float) - truncation radius in units of sig
+        chunk (int) - maximal number of points splatted at once
+    """
+    nx, ny = len(x), len(y)
+    dx = (x[-1] - x[0]) / (nx - 1) if nx > 1 else 1.0
+    dy = (y[-1] - y[0]) / (ny - 1) if ny > 1 else 1.0
+
+    ## half width of the stencil in pixels along each axis, the stencil is centered on the nearest pixel which is up to half a
+    # pixel away from the point, so one more pixel keeps every pixel closer than cutoff*sig to the point inside it
+    kx = int(np.ceil(cutoff * sig / dx)) + 1
+    ky = int(np.ceil(cutoff * sig / dy)) + 1
+    ox = np.arange(-kx, kx + 1)
+    oy = np.arange(-ky, ky + 1)
+
+    ## the splatted block of one chunk has chunk*(2kx+1)*(2ky+1) values, fine maps have wide stencils so the chunk is lowered
+    chunk = max(1, min(chunk, 2**22 // (len(ox) * len(oy))))
+
+    map = np.zeros(ny * nx)
+    for s in range(0, points.shape[0], chunk):
+        p = points[s:s + chunk]
+
+        ## pixel indices of the stencil around the nearest pixel of each point, pixels outside the map get zero weight
+        ix = np.rint((p[:, 0] - x[0]) / dx).astype(np.int64)[:, None] + ox
+        iy = np.rint((p[:, 1] - y[0]) / dy).astype(np.int64)[:, None] + oy
+        inx = (ix >= 0) & (ix < nx)
+        iny = (iy >= 0) & (iy < ny)
+        ix = np.clip(ix, 0, nx - 1)
+        iy = np.clip(iy, 0, ny - 1)
+
+        gx = np.exp(-(x[ix] - p[:, 0, None])**2 / (2 * sig**2)) * inx
+        gy = np.exp(-(y[iy] - p[:, 1, None])**2 / (2 * sig**2)) * iny
+
+        weights = gy[:, :, None] * gx[:, None, :]
+        idx = iy[:, :, None] * nx + ix[:, None, :]
+        map += np.bincount(idx.ravel(), weights=weights.ravel(), minlength=ny * nx)
+
+    map *= 1 / (2 * np.pi * sig**2)
+    return map.reshape(ny, nx)
+
+## Available rendering backends for add_points, 'loop' is the original implementation and is kept as the reference
+BACKENDS = {
+    'loop': render_loop,
+    'separable': render_separable,
+    'stencil': render_stencil,
+}
+
+## relative size of the empty border of the maps on all sides
+BUFFER = 0.1
+
+def map_grid(points, N):
+    """
+    Coordinates of the map on which the Gaussians of the points are evaluated
+
+    Parameters:
+        points (numpy.ndarray) - input points
         N (int) - Number of values in one principal direction of the map
     """
     ## Here based on the scale of the points the program makes an array of points in which the Gaussians are evaluated 
@@ -31,24 +143,76 @@ def add_points(points, sig, N):
     min_x, max_x = np.min(points[:, 0]), np.max(points[:, 0])
     min_y, max_y = np.min(points[:, 1]), np.max(points[:, 1])
 
-    buffer_x = 0.1 * (max_x - min_x) if max_x != min_x else 1.0
-    buffer_y = 0.1 * (max_y - min_y) if max_y != min_y else 1.0
+    buffer_x = BUFFER * (max_x - min_x) if max_x != min_x else 1.0
+    buffer_y = BUFFER * (max_y - min_y) if max_y != min_y else 1.0
 
     x0, x1 = min_x - buffer_x, max_x + buffer_x
     y0, y1 = min_y - buffer_y, max_y + buffer_y
 
     x = np.linspace(x0, x1, N)
     y = np.linspace(y0, y1, N)
-    xx, yy = np.meshgrid(x, y)
+    return x, y, (x0, x1, y0, y1)
 
-    map = np.zeros_like(xx)
+def add_points(points, sig, N, backend='loop'):
+    """
+    Adds Gaussians to points on input and generates a map of values
 
-    # Adds a Gaussian for each point and tracks a count of the Gaussians added, since the program from main.py can run quite long
-    i = 0
-    for p in points:
-        i+=100
-        map += gauss(xx, yy, p, sig)
-        print(f'Adding Gaussians to point mesh: {round(i/points.shape[0],2)} %', end = '\r')
+    Parameters:
+        points (numpy.ndarray) - input points
+        sig (float) - standard deviation of added Gaussians
+        N (int) - Number of values in one principal direction of the map
+        backend (str) - rendering backend from BACKENDS, 'loop' is the reference, 'separable' and 'stencil' are faster
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose from {list(BACKENDS)}")
+
+    x, y, extent = map_grid(points, N)
+
+    map = BACKENDS[backend](points, sig, x, y)
+    print(f'Gaussians added for parameters sigma = {sig} and N = {N}')
+
+    return map, x, y, extent
+
+def add_points_tiled(points, sig, N, path, tile=2048, backend='separable', cutoff=6, dtype=np.float64):
+    """
+    Same map as add_points but rendered tile by tile into a np.memmap file, so the memory is bounded by the tile size instead
+    of N^2. Each tile only gets the points inside its bounding box extended by cutoff*sig, the truncation error is the same as
+    for render_stencil with this cutoff
+
+    Parameters:
+        points (numpy.ndarray) - input points
+        sig (float) - standard deviation of added Gaussians
+        N (int) - Number of values in one principal direction of the map
+        path (str) - path of the file of the map
+        tile (int) - number of values in one direction of a tile
+        backend (str) - rendering backend from BACKENDS used for each tile
+        cutoff (float) - radius in units of sig within which the points are assigned to a tile
+        dtype (numpy.dtype) - type of the values of the map
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose from {list(BACKENDS)}")
+
+    x, y, extent = map_grid(points, N)
+    map = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(N, N))
+
+    ## the points are sorted by y so that the band of a tile row is found by a binary search
+    points = points[np.argsort(points[:, 1])]
+    reach = cutoff * sig
+
+    n_tiles = -(-N // tile)
+    for r0 in range(0, N, tile):
+        r1 = min(r0 + tile, N)
+        lo, hi = np.searchsorted(points[:, 1], [y[r0] - reach, y[r1 - 1] + reach])
+        band = points[lo:hi]
+        for c0 in range(0, N, tile):
+            c1 = min(c0 + tile, N)
+            near = band[(band[:, 0] >= x[c0] - reach) & (band[:, 0] <= x[c1 - 1] + reach)]
+            if len(near):
+                map[r0:r1, c0:c1] = BACKENDS[backend](near, sig, x[c0:c1], y[r0:r1])
+            else:
+                map[r0:r1, c0:c1] = 0
+        print(f'Adding Gaussians to tiles: {round(100 * (r0 // tile + 1) / n_tiles, 2)} %', end = '\r')
+    map.flush()
     print(f'Gaussians added for parameters sigma = {sig} and N = {N}')
 
-    return map, x, y, (x0, x1, y0, y1)
+    return map, x, y, extent
@@ -0,0 +1,146 @@
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from matplotlib.figure import Figure
+import bragg_peaks as bp
+import point_io as pio
+import result_cache as rc
+from render_stage import hex_reference, map_and_zoomed_fft
+
+## Headless version of the analysis part of main.py. Every (file, sigma) pair is one job of a process pool, the figures are drawn
+# on plain matplotlib Figure objects (Agg, no windows and no plt.pause) and saved by a writer thread while the job computes the
+# next map, the saved files and their paths are the same as in main.py. The maps and spectra are computed by render_stage. With
+# a cache folder the maps, spectra and peaks of every (points, sigma, N) are stored by result_cache and the next run only
+# computes the new point files or parameters
+
+
+def save_map_figure(path, map, extent, title):
+    """
+    Saves the figure of a Gaussian map, the same figure as in main.py
+
+    Parameters:
+        path (str) - path of the .png file
+        map (numpy.ndarray) - Gaussian map
+        extent (tuple) - extent of the map
+        title (str) - title of the figure
+    """
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot()
+    im = ax.imshow(map, extent=extent, origin='lower', cmap='hot')
+    fig.colorbar(im, ax=ax, label='Gaussian Intensity')
+    ax.set_title(title)
+    ax.set_xlabel("X")
+    ax.set_ylabel("Y")
+    fig.tight_layout()
+    fig.savefig(path)
+
+def save_fft_figure(path, fft_zoom, title):
+    """
+    Saves the figure of a zoomed FFT, the same figure as in main.py
+
+    Parameters:
+        path (str) - path of the .png file
+        fft_zoom (numpy.ndarray) - zoomed magnitude of the FFT
+        title (str) - title of the figure
+    """
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot()
+    im = ax.imshow(fft_zoom, cmap='viridis')
+    ax.set_title(title)
+    ax.set_xlabel("Freq X")
+    ax.set_ylabel("Freq Y")
+    fig.colorbar(im, ax=ax, label='Magnitude')
+    fig.tight_layout()
+    fig.savefig(path)
+
+def render_job(point_file, sigma, N, a=1, backend='stencil', spectrum_mode='fft', zoom_mode='crop',
+               base_folder='Saved_figures', cache_folder=None):
+    """
+    Makes and saves the four figures and the two peak tables of one (file, sigma) pair, returns the list of saved paths
+
+    Parameters:
+        point_file (str) - path of the .npy point file
+        sigma (float) - standard deviation of added Gaussians
+        N (int) - Number of values in one principal direction of the map
+        a (float) - lattice parameter of the hexagonal grid
+        backend (str) - rendering backend of add_gauss.add_points
+        spectrum_mode (str) - 'fft' or 'direct'
+        zoom_mode (str) - 'crop' or 'czt'
+        base_folder (str) - folder of the saved figures
+        cache_folder (str) - folder of the result cache, nothing is cached if None
+    """
+    points, meta = pio.load_points(point_file)
+    hex_points = hex_reference(points, meta, a)
+    cache = rc.ResultCache(cache_folder) if cache_folder else None
+
+    file_base = os.path.splitext(point_file)[0]
+    sigma_folder = os.path.join(base_folder, file_base, f"sigma_{sigma}")
+    os.makedirs(sigma_folder, exist_ok=True)
+
+    ## the figures of the hexagonal grid are written while the quasicrystal is computed
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        map1, extent1, fft1_zoom, peaks1 = map_and_zoomed_fft(hex_points, sigma, N, backend, spectrum_mode, zoom_mode,
+                                                              cache)
+        bp.save_peaks(f"{sigma_folder}/hexpeaks_sigma{sigma}_N{N}.npy", peaks1)
+        writes = [
+            writer.submit(save_map_figure, f"{sigma_folder}/hexmap_sigma{sigma}_N{N}.png", map1, extent1,
+                          f"Gaussian Map (Hexagonal grid): σ={sigma}, N={N}"),
+            writer.submit(save_fft_figure, f"{sigma_folder}/hexfft_zoomed_sigma{sigma}_N{N}.png", fft1_zoom,
+                          f"Zoomed FFT (Hexagonal grid): σ={sigma}, N={N}"),
+        ]
+
+        map2, extent2, fft2_zoom, peaks2 = map_and_zoomed_fft(points, sigma, N, backend, spectrum_mode, zoom_mode, cache)
+        bp.save_peaks(f"{sigma_folder}/pointpeaks_sigma{sigma}_N{N}.npy", peaks2)
+        writes += [
+            writer.submit(save_map_figure, f"{sigma_folder}/pointmap_sigma{sigma}_N{N}.png", map2, extent2,
+                          f"Gaussian Map (Quasicrystal) ({point_file}): σ={sigma}, N={N}"),
+            writer.submit(save_fft_figure, f"{sigma_folder}/pointfft_zoomed_sigma{sigma}_N{N}.png", fft2_zoom,
+                          f"Zoomed FFT (Quasicrystal) ({point_file}): σ={sigma}, N={N}"),
+        ]
+        for w in writes:
+            w.result()
+
+    return [
+        f"{sigma_folder}/hexmap_sigma{sigma}_N{N}.png",
+        f"{sigma_folder}/hexfft_zoomed_sigma{sigma}_N{N}.png",
+        f"{sigma_folder}/pointmap_sigma{sigma}_N{N}.png",
+        f"{sigma_folder}/pointfft_zoomed_sigma{sigma}_N{N}.png",
+        f"{sigma_folder}/hexpeaks_sigma{sigma}_N{N}.npy",
+        f"{sigma_folder}/pointpeaks_sigma{sigma}_N{N}.npy",
+    ]
+
+def run_batch(point_files, sigmas, Ns, a=1, backend='stencil', spectrum_mode='fft', zoom_mode='crop',
+              base_folder='Saved_figures', workers=None, cache_folder=None):
+    """
+    Runs render_job for every (file, sigma) pair in a process pool, returns the list of all saved paths
+
+    Parameters:
+        point_files (list) - paths of the .npy point files
+        sigmas (list) - standard deviations of added Gaussians
+        Ns (list) - Number of values in one principal direction of the map for each sigma
+        a (float) - lattice parameter of the hexagonal grid
+        backend (str) - rendering backend of add_gauss.add_points
+        spectrum_mode (str) - 'fft' or 'direct'
+        zoom_mode (str) - 'crop' or 'czt'
+        base_folder (str) - folder of the saved figures
+        workers (int) - number of worker processes, all cores by default
+        cache_folder (str) - folder of the result cache, nothing is cached if None
+    """
+    saved = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_job, point_file, sigma, N, a, backend, spectrum_mode, zoom_mode, base_folder,
+                                   cache_folder)
+                   for point_file in point_files for sigma, N in zip(sigmas, Ns)]
+        for i, future in enumerate(as_completed(futures)):
+            saved.extend(future.result())
+            print(f'Finished {i + 1}/{len(futures)} rendering jobs')
+    return saved
+
+
+if __name__ == '__main__':
+    ## Same parameters as main.py
+    sigmas = [0.02, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25,0.3]
+    Ns = [1000] * len(sigmas)
+
+    pio.convert_folder("points")
+    run_batch(sorted(glob.glob(os.path.join("points","*.npy"))), sigmas, Ns, cache_folder='cache')
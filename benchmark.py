@@ -0,0 +1,260 @@
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import contextlib
+import numpy as np
+
+## Benchmarks of the hot paths of the generation, rendering and spectra. Every case is timed several times on a fixed point set
+# (the deterministic inflation tiling or seeded random points) and the peak of the memory traced by tracemalloc is recorded,
+# numpy reports its arrays to tracemalloc. The results are saved as JSON and two result files can be compared
+#
+#     python benchmark.py run results.json [--quick]
+#     python benchmark.py compare old.json new.json [--threshold 1.2]
+
+
+def tiling_points(P):
+    """
+    Fixed point set of about P points, the vertices of the inflation tiling closest to the origin
+
+    Parameters:
+        P (int) - number of points
+    """
+    import inflation_tiling as it
+    generations = 1
+    while 13 ** generations < P:
+        generations += 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        points = it.inflation_tiling(generations + 1)
+    return points[:P]
+
+def random_points(P, seed=0):
+    """
+    Seeded random points in a square with the same density as the tiling
+
+    Parameters:
+        P (int) - number of points
+        seed (int) - seed of the random generator
+    """
+    half = np.sqrt(P) / 2
+    return np.random.default_rng(seed).uniform(-half, half, (P, 2))
+
+def measure(fn, repeat=3):
+    """
+    Runs fn repeat times, returns the minimal and median time and the peak traced memory in MB, the prints of fn are hidden.
+    tracemalloc slows down every allocation, so the timed runs are not traced and the memory is taken from one more run. If
+    fn returns a dictionary, the one of the last timed run is returned as 'details'
+
+    Parameters:
+        fn (function) - function without arguments
+        repeat (int) - number of timed runs
+    """
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            details = fn()
+        times.append(time.perf_counter() - t)
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {'min_s': min(times), 'median_s': float(np.median(times)), 'peak_mb': peak / 1e6}
+    if isinstance(details, dict):
+        result['details'] = details
+    return result
+
+def bench_add_points(quick):
+    import add_gauss as ag
+    cases = []
+    for P, N in ([(500, 200)] if quick else [(500, 500), (5000, 1000)]):
+        points = tiling_points(P)
+        for sigma in (0.05, 0.2):
+            for backend in ag.BACKENDS:
+                ## the reference loop is only timed on the smallest case
+                if backend == 'loop' and P * N * N > 500 * 500 * 500:
+                    continue
+                cases.append(('add_points', {'P': P, 'N': N, 'sigma': sigma, 'backend': backend},
+                              lambda p=points, s=sigma, n=N, b=backend: ag.add_points(p, s, n, b)))
+    return cases
+
+def bench_spectrum(quick):
+    from scipy.fft import fft2
+    import fft_stage as fs
+    from zoom_spectrum import dynamic_zoom_region
+    cases = []
+    for N in ([256] if quick else [1000, 2000]):
+        map = np.random.default_rng(0).random((N, N))
+
+        def full(m=map):
+            mag = np.abs(np.fft.fftshift(fft2(m)))
+            return mag[dynamic_zoom_region(mag)]
+
+        def real(m=map):
+            mag = fs.shifted_magnitude(m)
+            return mag[dynamic_zoom_region(mag)]
+
+        cases.append(('fft2+dynamic_zoom_region', {'N': N}, full))
+        cases.append(('shifted_magnitude+dynamic_zoom_region', {'N': N}, real))
+    return cases
+
+def bench_check_overlap(quick):
+    from shapely.geometry import Polygon
+    from shapely import STRtree
+    import generate_mesh_bcup2 as gm
+    from quasi_tiling import build_points, rotated_points
+
+    ## the polygons are copies of the three base tiles shifted along a line, the new tiles are placed at its end
+    base = rotated_points(build_points(np.array([[0, 0], [1, 0], [1 + np.sqrt(3) / 2, 0.5]]), 1, 1)[0])
+    tiles = [base[i:i+8] for i in (0, 8, 40)]
+    expected_area = np.sqrt(3) / 4
+    cases = []
+    for M in ([30] if quick else [50, 500, 5000]):
+        polygons = [Polygon(t + [10 * k, 0]) for k in range(M // 3 + 1) for t in tiles][:M]
+        new = [Polygon(t + [10 * (M // 3 + 2), 0]) for t in tiles]
+        tree = STRtree(polygons)
+        cases.append(('check_overlap', {'polygons': M, 'index': 'none'},
+                      lambda p=polygons, n=new: gm.check_overlap(p, n, expected_area)))
+        cases.append(('check_overlap', {'polygons': M, 'index': 'strtree'},
+                      lambda p=polygons, n=new, t=tree: gm.check_overlap(p, n, expected_area, t)))
+    return cases
+
+def bench_point_ops(quick):
+    import generate_mesh_bcup2 as gm
+    from quasi_tiling import rotated_points
+    from point_store import PointStore
+    import lattices as lt
+    cases = []
+    for M in ([1000] if quick else [1000, 100000]):
+        points = random_points(M)
+        cases.append(('rotated_points', {'M': M}, lambda p=points: rotated_points(p)))
+        duplicated = np.vstack((points, points + 1e-8))
+        cases.append(('dedup_preserve_order', {'M': 2 * M}, lambda p=duplicated: gm.dedup_preserve_order(p, 6)))
+        cases.append(('PointStore.insert', {'M': 2 * M}, lambda p=duplicated: PointStore(p, 6)))
+    for maxdist in ([50] if quick else [50, 500]):
+        cases.append(('lattices.sigma_phase', {'maxdist': maxdist}, lambda r=maxdist: lt.sigma_phase(r)))
+    return cases
+
+def bench_generator(quick):
+    import generate_mesh_bcup2 as gm
+    cycles = 5 if quick else 20
+
+    ## the time and the sizes of every cycle show how the cost grows with the number of temporary points
+    def run(c=cycles):
+        events = []
+        for _ in gm.generate_quasicrystal(c, 1, on_cycle=events.append):
+            pass
+        return {
+            'cycle_s': [event['time']['cycle'] for event in events],
+            'temp': [event['sizes']['temp'] for event in events],
+            'polygons': [event['sizes']['polygons'] for event in events],
+        }
+
+    ## the memory of the worker processes is not traced, only the memory of the main process
+    return [('generate_quasicrystal', {'cycles': cycles}, run)]
+
+def bench_inflation(quick):
+    import inflation_tiling as it
+    generations = 3 if quick else 5
+    return [('inflation_tiling', {'generations': generations}, lambda g=generations: it.inflation_tiling(g))]
+
+## All groups of benchmarks
+GROUPS = {
+    'add_points': bench_add_points,
+    'spectrum': bench_spectrum,
+    'check_overlap': bench_check_overlap,
+    'point_ops': bench_point_ops,
+    'generator': bench_generator,
+    'inflation': bench_inflation,
+}
+
+def run(groups=None, quick=False, repeat=3):
+    """
+    Runs the benchmarks and returns the results as a dictionary ready for JSON
+
+    Parameters:
+        groups (list) - names of the groups from GROUPS, all groups by default
+        quick (Boolean) - uses the small sizes only
+        repeat (int) - number of runs of each case
+    """
+    results = []
+    for group in groups or GROUPS:
+        for name, params, fn in GROUPS[group](quick):
+            ## the generation is timed once, it takes the longest and its cycles are not independent
+            entry = {'group': group, 'name': name, 'params': params}
+            entry.update(measure(fn, 1 if group == 'generator' else repeat))
+            results.append(entry)
+            print(f"{name} {params}: {entry['min_s']:.4f} s, {entry['peak_mb']:.1f} MB")
+            if 'cycle_s' in entry.get('details', {}):
+                print('    seconds per cycle: ' + ', '.join(f'{t:.3f}' for t in entry['details']['cycle_s']))
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'quick': quick,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+def compare(old, new, threshold=1.2):
+    """
+    Compares two result dictionaries case by case, returns the list of the cases that got slower or use more memory than
+    threshold times the old value
+
+    Parameters:
+        old (dict) - results of the reference run
+        new (dict) - results of the new run
+        threshold (float) - allowed ratio of the new and the old value
+    """
+    def key(entry):
+        return entry['name'], json.dumps(entry['params'], sort_keys=True)
+
+    reference = {key(e): e for e in old['results']}
+    regressions = []
+    for entry in new['results']:
+        ref = reference.get(key(entry))
+        if ref is None:
+            continue
+        time_ratio = entry['min_s'] / ref['min_s'] if ref['min_s'] else float('inf')
+        memory_ratio = entry['peak_mb'] / ref['peak_mb'] if ref['peak_mb'] else 1.0
+        flag = time_ratio > threshold or memory_ratio > threshold
+        print(f"{'REGRESSION ' if flag else ''}{entry['name']} {entry['params']}: time x{time_ratio:.2f}, "
+              f"memory x{memory_ratio:.2f}")
+        if flag:
+            regressions.append({'name': entry['name'], 'params': entry['params'],
+                                'time_ratio': time_ratio, 'memory_ratio': memory_ratio})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the generation, rendering and spectra')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help='run the benchmarks and save the results as JSON')
+    run_parser.add_argument('output')
+    run_parser.add_argument('--quick', action='store_true', help='small sizes only')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--groups', nargs='*', choices=list(GROUPS))
+    compare_parser = sub.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        with open(args.output, 'w') as f:
+            json.dump(run(args.groups, args.quick, args.repeat), f, indent=2)
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
@@ -0,0 +1,132 @@
+import numpy as np
+from scipy.ndimage import maximum_filter
+from scipy.spatial import cKDTree
+
+## This part of code turns the magnitude of a spectrum into a short table of its Bragg peaks. The peaks are the local maxima above
+# a threshold, found for the whole array at once with a maximum filter, and their positions are refined below the pixel size by
+# fitting a parabola to the logarithm of the three values around the maximum along each axis (exact for a Gaussian peak). The
+# table is a structured array with the fields kx, ky, k, angle, intensity and spacing, 48 bytes per peak instead of an image.
+# The finite point sets have sidelobes around every Bragg peak at a few percent of its height, which are local maxima as well,
+# so the default threshold is 10 % of the maximum (the threshold of zoom_spectrum.dynamic_zoom_region), at 1 % the sidelobes
+# outnumber the Bragg peaks by orders of magnitude and dominate the symmetry scores
+
+## Default threshold of the peaks relative to the maximum of the spectrum
+THRESHOLD_RATIO = 0.1
+
+## Fields of the peak table, the wave vector in radians per unit length, the angle in degrees in [0, 360) and the resolution of
+# the spectrum, the larger pixel spacing of its discrete transform in the two directions
+PEAK_DTYPE = np.dtype([('kx', np.float64), ('ky', np.float64), ('k', np.float64), ('angle', np.float64),
+                       ('intensity', np.float64), ('spacing', np.float64)])
+
+
+def _refine(left, center, right):
+    ## offset of the vertex of the parabola through log values at -1, 0, 1, in (-0.5, 0.5) for a strict maximum
+    left, center, right = (np.log(np.maximum(v, np.finfo(np.float64).tiny)) for v in (left, center, right))
+    denominator = left - 2 * center + right
+    offset = np.zeros_like(center)
+    np.divide(0.5 * (left - right), denominator, out=offset, where=denominator < 0)
+    return np.clip(offset, -0.5, 0.5)
+
+def local_maxima(mag, threshold_ratio=THRESHOLD_RATIO, size=3):
+    """
+    Pixel indices (rows, cols) of the local maxima of mag higher than threshold_ratio times its maximum, the border pixels are
+    skipped because they can not be refined
+
+    Parameters:
+        mag (numpy.ndarray) - magnitude of the spectrum
+        threshold_ratio (float) - threshold of the peaks relative to the maximum
+        size (int) - size of the neighbourhood of the maximum filter in pixels
+    """
+    peak = (mag == maximum_filter(mag, size=size, mode='nearest')) & (mag > threshold_ratio * np.max(mag))
+    peak[[0, -1], :] = False
+    peak[:, [0, -1]] = False
+    return np.nonzero(peak)
+
+def extract_peaks(mag, kx, ky, threshold_ratio=THRESHOLD_RATIO, size=3, max_peaks=None, spacing=None):
+    """
+    Table of the Bragg peaks of a spectrum sorted by decreasing intensity, see PEAK_DTYPE
+
+    Parameters:
+        mag (numpy.ndarray) - magnitude of the spectrum of shape (len(ky), len(kx)), e.g. from fft_stage.shifted_magnitude
+        kx (numpy.ndarray) - evenly spaced wave vectors of the columns, e.g. from structure_factor.fft_kgrid
+        ky (numpy.ndarray) - evenly spaced wave vectors of the rows
+        threshold_ratio (float) - threshold of the peaks relative to the maximum
+        size (int) - size of the neighbourhood of the maximum filter in pixels
+        max_peaks (int) - only the strongest peaks are kept if given
+        spacing (float) - resolution of the spectrum stored in the table, by default the larger pixel spacing of kx and ky. The
+                          chirp-z transform of zoom_spectrum oversamples the window and passes the pixel spacing of the full FFT
+    """
+    rows, cols = local_maxima(mag, threshold_ratio, size)
+    center = mag[rows, cols]
+    order = np.argsort(center)[::-1][:max_peaks]
+    rows, cols, center = rows[order], cols[order], center[order]
+
+    dcol = _refine(mag[rows, cols - 1], center, mag[rows, cols + 1])
+    drow = _refine(mag[rows - 1, cols], center, mag[rows + 1, cols])
+
+    dkx = (kx[-1] - kx[0]) / (len(kx) - 1)
+    dky = (ky[-1] - ky[0]) / (len(ky) - 1)
+    table = np.empty(len(rows), dtype=PEAK_DTYPE)
+    table['kx'] = kx[0] + (cols + dcol) * dkx
+    table['ky'] = ky[0] + (rows + drow) * dky
+    table['k'] = np.hypot(table['kx'], table['ky'])
+    ## the modulo of a tiny negative angle rounds to 360
+    table['angle'] = np.degrees(np.arctan2(table['ky'], table['kx'])) % 360
+    table['angle'][table['angle'] >= 360] = 0
+    table['intensity'] = center
+    table['spacing'] = spacing or max(abs(dkx), abs(dky))
+    return table
+
+def symmetry_score(peaks, order, k_min=None, tolerance=None):
+    """
+    Rotational symmetry score of the peaks in [0, 1], the share of the intensity which is matched by a peak of the pattern
+    rotated by 360/order degrees, every pair adds the smaller of the two intensities
+
+    Parameters:
+        peaks (numpy.ndarray) - peak table from extract_peaks
+        order (int) - order of the rotation
+        k_min (float) - peaks with smaller |k| are skipped, by default 4 spacings, which skips the central peak and the sidelobes
+                        of the sample shape around it (above 10 % of the central peak up to about 3.5 spacings)
+        tolerance (float) - largest distance of matched peaks, by default 1.5 spacings of the spectrum
+    """
+    if len(peaks) == 0:
+        return 0.0
+    ## the refined positions are accurate to a fraction of a pixel, so a rotated peak lies within the pixel diagonal of its
+    # partner, a tolerance relative to |k| would grow with the spectrum and match the neighbours of the dense outer peaks
+    spacing = np.max(peaks['spacing'])
+    tolerance = tolerance or 1.5 * spacing
+    peaks = peaks[peaks['k'] >= (4 * spacing if k_min is None else k_min)]
+    if len(peaks) == 0:
+        return 0.0
+
+    positions = np.column_stack((peaks['kx'], peaks['ky']))
+    phi = 2 * np.pi / order
+    rotation = np.array([[np.cos(phi), -np.sin(phi)], [np.sin(phi), np.cos(phi)]])
+    distance, match = cKDTree(positions).query(positions @ rotation.T, distance_upper_bound=tolerance)
+    found = np.isfinite(distance)
+
+    intensity = peaks['intensity']
+    matched = np.minimum(intensity[found], intensity[match[found]]).sum()
+    return float(matched / intensity.sum())
+
+def symmetry_scores(peaks, orders=(6, 12), k_min=None, tolerance=None):
+    """
+    Dictionary of symmetry_score for every order, the 12-fold score is high for the quasicrystal and low for the hexagonal grid
+
+    Parameters:
+        peaks (numpy.ndarray) - peak table from extract_peaks
+        orders (tuple) - orders of the rotations
+        k_min (float) - peaks with smaller |k| are skipped, by default 4 spacings of the spectrum
+        tolerance (float) - largest distance of matched peaks, by default 1.5 spacings of the spectrum
+    """
+    return {order: symmetry_score(peaks, order, k_min, tolerance) for order in orders}
+
+def save_peaks(path, peaks):
+    """
+    Saves the peak table as a .npy file, it is loaded back with np.load(path)
+
+    Parameters:
+        path (str) - path of the .npy file
+        peaks (numpy.ndarray) - peak table from extract_peaks
+    """
+    np.save(path, peaks)
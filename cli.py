@@ -0,0 +1,324 @@
+import os
+import sys
+import glob
+import json
+import argparse
+
+## Command line entry point of the project. Each subcommand imports only the modules it needs, so a job that only renders maps does
+# not load shapely or matplotlib and the worker processes start fast
+#
+#     python cli.py generate --cycles 35 --side 1 --output points/points1.npy [--checkpoint points/checkpoint.npz] [--resume]
+#     python cli.py render [files] --sigmas 0.05 0.1 --N 1000 [--workers 4] [--show] [--cache cache | --no-cache]
+#     python cli.py spectrum [files] --sigmas 0.05 0.1 --N 1000 [--output spectra] [--polar --order 6 --no-check]
+#     python cli.py analyze [files] --sigmas 0.05 0.1 --N 1000 [--summary analysis.json]
+#     python cli.py pairs [files] [--reference] [--output pair_correlation.json]
+#
+# Without files all .npy files of the points folder are used, the old .txt files are converted first
+
+## Same sigmas as main.py
+SIGMAS = [0.02, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3]
+
+
+def point_files(files):
+    """
+    Returns the given point files, or all .npy files of the points folder after converting the old .txt files
+
+    Parameters:
+        files (list) - paths of the .npy point files, can be empty
+    """
+    if files:
+        return files
+    import point_io as pio
+    pio.convert_folder("points")
+    return sorted(glob.glob(os.path.join("points", "*.npy")))
+
+def sigma_ns(sigmas, Ns):
+    """
+    Pairs the sigmas with the map sizes, a single N is used for all sigmas
+
+    Parameters:
+        sigmas (list) - standard deviations of added Gaussians
+        Ns (list) - Number of values in one principal direction of the map, one value or one for each sigma
+    """
+    if len(Ns) == 1:
+        Ns = Ns * len(sigmas)
+    if len(Ns) != len(sigmas):
+        raise ValueError(f'Expected 1 or {len(sigmas)} values of N, got {len(Ns)}')
+    return list(zip(sigmas, Ns))
+
+def run_jobs(fn, jobs, workers=None):
+    """
+    Runs fn(*job) for every job, in a process pool unless workers is 1, returns the results in the order of the jobs
+
+    Parameters:
+        fn (function) - module level function of the job
+        jobs (list) - tuples of arguments
+        workers (int) - number of worker processes, all cores by default
+    """
+    if workers == 1:
+        return [fn(*job) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fn, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+def spectrum_job(point_file, sigma, N, backend='stencil', spectrum_mode='fft', single=False, base_folder='spectra'):
+    """
+    Computes the shifted magnitude of the spectrum of one (file, sigma) pair and saves its peak region with the wave vectors
+    as a compressed .npz file with the arrays magnitude, kx and ky, returns its path
+
+    Parameters:
+        point_file (str) - path of the .npy point file
+        sigma (float) - standard deviation of added Gaussians
+        N (int) - Number of values in one principal direction of the map
+        backend (str) - rendering backend of add_gauss.add_points
+        spectrum_mode (str) - 'fft' or 'direct'
+        single (Boolean) - computes the transform in float32 instead of float64
+        base_folder (str) - folder of the saved spectra
+    """
+    import numpy as np
+    import add_gauss as ag
+    import structure_factor as sf
+    import fft_stage as fs
+    import point_io as pio
+    from zoom_spectrum import dynamic_zoom_region
+
+    points, _ = pio.load_points(point_file)
+    map, x, y, _ = ag.add_points(points, sigma, N, backend)
+    if spectrum_mode == 'direct':
+        mag = sf.fft_magnitude(points, sigma, x, y)
+    else:
+        mag = fs.shifted_magnitude(map, workers=1, single=single)
+    kx, ky = sf.fft_kgrid(x, y)
+    zoom_slice = dynamic_zoom_region(mag)
+
+    folder = os.path.join(base_folder, os.path.splitext(point_file)[0], f"sigma_{sigma}")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"spectrum_sigma{sigma}_N{N}.npz")
+    np.savez_compressed(path, magnitude=mag[zoom_slice], kx=kx[zoom_slice[1]], ky=ky[zoom_slice[0]])
+    return path
+
+def polar_job(point_file, sigma, k_max=20, n_k=256, n_theta=64, order=6, check=True, base_folder='spectra', a=1):
+    """
+    Computes the polar diffraction pattern of one (file, sigma) pair and of the hexagonal grid cropped to the same disk from one
+    symmetry wedge and saves it as a compressed .npz file with the arrays magnitude, k, theta, radial and angular profiles and
+    the wedge deviation, the arrays of the hexagonal grid have the prefix hex_, returns its path
+
+    Parameters:
+        point_file (str) - path of the .npy point file
+        sigma (float) - standard deviation of added Gaussians
+        k_max (float) - largest |k|
+        n_k (int) - number of radii
+        n_theta (int) - number of angles in one wedge
+        order (int) - order of the rotational symmetry
+        check (Boolean) - evaluates also the second wedge and raises ValueError if the symmetry does not hold
+        base_folder (str) - folder of the saved spectra
+        a (float) - lattice parameter of the hexagonal grid
+    """
+    import numpy as np
+    import point_io as pio
+    import polar_diffraction as pd
+    import lattices as lt
+
+    points, _ = pio.load_points(point_file)
+    hex_points = lt.hexagonal(np.max(np.linalg.norm(points, axis=1)), a)
+    arrays = {}
+    for prefix, pts in (('', points), ('hex_', hex_points)):
+        mag, k, theta, deviation = pd.polar_spectrum(pts, sigma, k_max, n_k, n_theta, order, check=check)
+        arrays.update({f'{prefix}magnitude': mag, f'{prefix}radial': pd.radial_profile(mag),
+                       f'{prefix}angular': pd.angular_profile(mag, k),
+                       f'{prefix}deviation': np.nan if deviation is None else deviation})
+
+    folder = os.path.join(base_folder, os.path.splitext(point_file)[0], f"sigma_{sigma}")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"polar_sigma{sigma}_order{order}.npz")
+    np.savez_compressed(path, k=k, theta=theta, **arrays)
+    return path
+
+def analyze_job(point_file, sigma, N, a=1, backend='stencil', spectrum_mode='fft', zoom_mode='crop', base_folder='Saved_figures',
+                cache_folder=None):
+    """
+    Extracts the Bragg peaks of the points and of their hexagonal grid for one (file, sigma) pair, saves the peak tables next to
+    the figures of batch_render and returns the summary with the number of peaks and the symmetry scores
+
+    Parameters:
+        point_file (str) - path of the .npy point file
+        sigma (float) - standard deviation of added Gaussians
+        N (int) - Number of values in one principal direction of the map
+        a (float) - lattice parameter of the hexagonal grid
+        backend (str) - rendering backend of add_gauss.add_points
+        spectrum_mode (str) - 'fft' or 'direct'
+        zoom_mode (str) - 'crop' or 'czt'
+        base_folder (str) - folder of the saved peak tables
+        cache_folder (str) - folder of the result cache, nothing is cached if None
+    """
+    import render_stage as rs
+    import bragg_peaks as bp
+    import point_io as pio
+    import result_cache as rc
+
+    points, meta = pio.load_points(point_file)
+    folder = os.path.join(base_folder, os.path.splitext(point_file)[0], f"sigma_{sigma}")
+    os.makedirs(folder, exist_ok=True)
+    cache = rc.ResultCache(cache_folder) if cache_folder else None
+
+    summary = {'file': point_file, 'sigma': sigma, 'N': N}
+    for name, pts in (('hex', rs.hex_reference(points, meta, a)), ('point', points)):
+        peaks = rs.map_and_zoomed_fft(pts, sigma, N, backend, spectrum_mode, zoom_mode, cache)[3]
+        bp.save_peaks(os.path.join(folder, f"{name}peaks_sigma{sigma}_N{N}.npy"), peaks)
+        summary[name] = {'peaks': len(peaks), 'symmetry': bp.symmetry_scores(peaks)}
+    return summary
+
+def generate(args):
+    if args.show:
+        import main
+        main.generation(args.cycles, args.side, args.workers, args.output, args.checkpoint, args.resume, args.log)
+        return
+
+    import point_io as pio
+    if args.inflation is not None:
+        import inflation_tiling as it
+        points = it.inflation_tiling(args.inflation, args.side, args.radius)
+        pio.save_points(args.output, points, side=args.side)
+        return
+
+    import generate_mesh_bcup2 as gm
+    if args.resume:
+        points, _ = gm.resume_quasicrystal(args.checkpoint, args.cycles, args.workers, log_path=args.log)
+    else:
+        points, _ = gm.quasicrystal(args.cycles, args.side, args.workers, checkpoint=args.checkpoint, log_path=args.log)
+    pio.save_points(args.output, points, side=args.side, cycles=args.cycles)
+
+def render(args):
+    pairs = sigma_ns(args.sigmas, args.N)
+    files = point_files(args.files)
+    sigmas, Ns = [s for s, _ in pairs], [n for _, n in pairs]
+    if args.show:
+        import main
+        main.analysis(files, sigmas, Ns, args.a, args.backend, args.spectrum_mode, zoom_mode=args.zoom_mode,
+                      base_folder=args.output, cache_folder=args.cache)
+        return
+
+    import batch_render as br
+    br.run_batch(files, sigmas, Ns, args.a, args.backend, args.spectrum_mode, args.zoom_mode, args.output, args.workers,
+                 args.cache)
+
+def spectrum(args):
+    if args.polar:
+        jobs = [(f, sigma, args.k_max, args.n_k, args.n_theta, args.order, args.check, args.output, args.a)
+                for f in point_files(args.files) for sigma in args.sigmas]
+        for path in run_jobs(polar_job, jobs, args.workers):
+            print(f'Saved {path}')
+        return
+    jobs = [(f, sigma, N, args.backend, args.spectrum_mode, args.single, args.output)
+            for f in point_files(args.files) for sigma, N in sigma_ns(args.sigmas, args.N)]
+    for path in run_jobs(spectrum_job, jobs, args.workers):
+        print(f'Saved {path}')
+
+def analyze(args):
+    jobs = [(f, sigma, N, args.a, args.backend, args.spectrum_mode, args.zoom_mode, args.output, args.cache)
+            for f in point_files(args.files) for sigma, N in sigma_ns(args.sigmas, args.N)]
+    summaries = run_jobs(analyze_job, jobs, args.workers)
+    for s in summaries:
+        print(f"{s['file']} σ={s['sigma']}, N={s['N']}: quasicrystal {s['point']['peaks']} peaks {s['point']['symmetry']}, "
+              f"hexagonal {s['hex']['peaks']} peaks {s['hex']['symmetry']}")
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summaries, f, indent=2)
+
+def pairs(args):
+    import pair_correlation as pc
+    results = pc.run_batch(point_files(args.files), args.reference, args.a, args.r_max, args.bins, args.bond_max, args.chunk)
+    with open(args.output, 'w') as f:
+        json.dump(results, f)
+
+def cache_options(parser):
+    """
+    Adds the options of the result cache to the parser of a subcommand
+
+    Parameters:
+        parser (argparse.ArgumentParser) - parser of the subcommand
+    """
+    parser.add_argument('--cache', default='cache', help='folder of the cache of the maps and spectra')
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=None, help='compute everything again')
+
+def parser():
+    """
+    Argument parser of all subcommands
+    """
+    parser = argparse.ArgumentParser(description='Generation and Fourier analysis of the quasicrystal point sets')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    gen = sub.add_parser('generate', help='generate a point set and save it as .npy')
+    gen.add_argument('--cycles', type=int, default=35)
+    gen.add_argument('--side', type=float, default=1)
+    gen.add_argument('--workers', type=int, help='worker processes, all cores by default')
+    gen.add_argument('--output', default=os.path.join('points', 'points1.npy'))
+    gen.add_argument('--checkpoint', help='checkpoint file written every cycle')
+    gen.add_argument('--resume', action='store_true', help='continue the run saved in the checkpoint')
+    gen.add_argument('--log', help='append the events of the cycles to this file as JSON lines')
+    gen.add_argument('--inflation', type=int, metavar='GENERATIONS', help='use the inflation tiling instead of the search')
+    gen.add_argument('--radius', type=float, help='crop radius of the inflation tiling')
+    gen.add_argument('--show', action='store_true', help='plot the points like main.py')
+    gen.set_defaults(func=generate)
+
+    ## the options shared by the subcommands working on point files
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('files', nargs='*', help='.npy point files, all files of the points folder by default')
+    common.add_argument('--sigmas', type=float, nargs='+', default=SIGMAS)
+    common.add_argument('--N', type=int, nargs='+', default=[1000], help='one value or one value for each sigma')
+    common.add_argument('--workers', type=int, help='worker processes, all cores by default')
+    common.add_argument('--backend', default='stencil', choices=['loop', 'separable', 'stencil'])
+    common.add_argument('--spectrum-mode', default='fft', choices=['fft', 'direct'])
+
+    ren = sub.add_parser('render', parents=[common], help='save the maps and zoomed FFTs of the points and hexagonal grids')
+    ren.add_argument('--a', type=float, default=1, help='lattice parameter of the hexagonal grid')
+    ren.add_argument('--zoom-mode', default='crop', choices=['crop', 'czt'])
+    ren.add_argument('--output', default='Saved_figures')
+    ren.add_argument('--show', action='store_true', help='show the figures like main.py instead of the headless batch')
+    cache_options(ren)
+    ren.set_defaults(func=render)
+
+    spec = sub.add_parser('spectrum', parents=[common], help='save the peak regions of the spectra as .npz')
+    spec.add_argument('--single', action='store_true', help='float32 transforms')
+    spec.add_argument('--output', default='spectra')
+    spec.add_argument('--polar', action='store_true', help='polar grid from one symmetry wedge instead of the FFT')
+    spec.add_argument('--order', type=int, default=6, help='order of the rotational symmetry of the polar grid')
+    spec.add_argument('--k-max', type=float, default=20, help='largest |k| of the polar grid')
+    spec.add_argument('--n-k', type=int, default=256, help='number of radii of the polar grid')
+    spec.add_argument('--n-theta', type=int, default=64, help='number of angles in one wedge of the polar grid')
+    spec.add_argument('--no-check', dest='check', action='store_false',
+                      help='skip the second wedge that validates the symmetry of the polar grid')
+    spec.add_argument('--a', type=float, default=1, help='lattice parameter of the hexagonal grid of the polar grid')
+    spec.set_defaults(func=spectrum)
+
+    ana = sub.add_parser('analyze', parents=[common], help='extract the Bragg peaks and the symmetry scores')
+    ana.add_argument('--a', type=float, default=1, help='lattice parameter of the hexagonal grid')
+    ana.add_argument('--zoom-mode', default='crop', choices=['crop', 'czt'])
+    ana.add_argument('--output', default='Saved_figures')
+    ana.add_argument('--summary', help='save the summaries as JSON')
+    cache_options(ana)
+    ana.set_defaults(func=analyze)
+
+    pair = sub.add_parser('pairs', help='pair correlation, bond statistics and vertex configurations as JSON')
+    pair.add_argument('files', nargs='*', help='.npy point files, all files of the points folder by default')
+    pair.add_argument('--reference', action='store_true', help='analyze also the hexagonal grid of each file')
+    pair.add_argument('--a', type=float, default=1, help='lattice parameter of the hexagonal grid')
+    pair.add_argument('--r-max', type=float, default=5)
+    pair.add_argument('--bins', type=int, default=250)
+    pair.add_argument('--bond-max', type=float, default=1.2)
+    pair.add_argument('--chunk', type=int, default=8192)
+    pair.add_argument('--output', default='pair_correlation.json')
+    pair.set_defaults(func=pairs)
+    return parser
+
+def main(argv=None):
+    arg_parser = parser()
+    args = arg_parser.parse_args(argv)
+    if args.command == 'generate' and args.resume and not args.checkpoint:
+        arg_parser.error('--resume needs the --checkpoint file of the run')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
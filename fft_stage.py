@@ -0,0 +1,58 @@
+import numpy as np
+from scipy.fft import rfft2, rfftfreq, fftfreq
+
+## This part of code computes the magnitude of the FT of the real Gaussian maps. The real input transform rfft2 only computes the
+# non negative x frequencies, the other half of the magnitude follows from the Hermitian symmetry |F(-k)| = |F(k)| and is written
+# directly into the shifted output, so no full size complex spectrum or extra shifted copies are made
+
+
+def hermitian_shift(half, shape):
+    """
+    Builds np.abs(np.fft.fftshift(F)) of a real input spectrum F from the magnitude of its rfft2 half
+
+    Parameters:
+        half (numpy.ndarray) - magnitude of the rfft2 spectrum of shape (Ny, Nx//2 + 1)
+        shape (tuple) - shape (Ny, Nx) of the real input
+    """
+    ny, nx = shape
+    out = np.empty(shape, dtype=half.dtype)
+
+    ## row i of the shifted output has the frequency ky = i - ny//2, columns nx//2 ... nx-1 are kx = 0, 1, ... taken directly,
+    # columns 0 ... nx//2-1 are kx < 0 taken from the mirrored frequency (-kx, -ky), all copies are plain slices
+    direct = half[:, :nx - nx // 2]
+    out[ny // 2:, nx // 2:] = direct[:ny - ny // 2]
+    out[:ny // 2, nx // 2:] = direct[ny - ny // 2:]
+
+    mirrored = half[:, nx // 2:0:-1]
+    out[:ny // 2 + 1, :nx // 2] = mirrored[ny // 2::-1]
+    out[ny // 2 + 1:, :nx // 2] = mirrored[ny - 1:ny // 2:-1]
+    return out
+
+def shifted_magnitude(map, workers=-1, single=False):
+    """
+    Same result as np.abs(np.fft.fftshift(fft2(map))) for a real map, computed with the real input transform
+
+    Parameters:
+        map (numpy.ndarray) - real Gaussian map
+        workers (int) - number of threads of the transform, -1 uses all cores
+        single (Boolean) - computes the transform in float32 instead of float64
+    """
+    map = np.asarray(map, dtype=np.float32 if single else np.float64)
+    ## the magnitude is written into the real part of the half spectrum instead of a new array
+    spec = rfft2(map, workers=workers)
+    half = np.abs(spec, out=spec.real)
+    return hermitian_shift(half, map.shape)
+
+def rfft_k2(x, y):
+    """
+    Squared length of the wave vectors of the rfft2 spectrum of a map sampled on the evenly spaced coordinates x and y
+
+    Parameters:
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+    """
+    dx = (x[-1] - x[0]) / (len(x) - 1)
+    dy = (y[-1] - y[0]) / (len(y) - 1)
+    kx = 2 * np.pi * rfftfreq(len(x), d=dx)
+    ky = 2 * np.pi * fftfreq(len(y), d=dy)
+    return kx[None, :]**2 + ky[:, None]**2
@@ -1,14 +1,23 @@
+import os
+import json
+import tempfile
 import numpy as np
+import multiprocessing
 from itertools import combinations
+from scipy.spatial import cKDTree
 from shapely.geometry import Polygon
+from shapely import STRtree
 from shapely.prepared import prep
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
 from quasi_tiling import (
     build_points as bp,
-    build_points2 as bp2,
+    build_points_batch as bp_batch,
+    build_points2_batch as bp2_batch,
     rotated_points as rp,
-    sort_by_distance_from_origin as sb,
+    triplet_sides,
 )
+from point_store import PointStore
+import lattices as lt
 import time
 
 ## This code generates the quasicrystal with use of geomtry from quasi_tiling
@@ -25,7 +34,7 @@ def dedup_preserve_order(points, decimals=6):
     _, idx = np.unique(np.round(points, decimals), axis=0, return_index=True)
     return points[np.sort(idx)]
 
-def check_overlap(polygons1, polygons2, expected_area):
+def check_overlap(polygons1, polygons2, expected_area, tree=None):
     """
     Checks the overlap of polygons from the quasi periodic tiling with respect to allowed overlap
 
@@ -33,10 +42,16 @@ def check_overlap(polygons1, polygons2, expected_area):
         polygons1 (numpy.ndarray) - an array of Polygon class objects that are checked but were used from previous steps
         polygons2 (numpy.ndarray) - an array of new Polygon class objects the are checked with poligon1 and then crosschecked
         expected_area (float) - allowed overlap between the polygons
+        tree (shapely.STRtree) - spatial index of polygons1, only the polygons with bounds touching the new ones are checked
     """
     ea = np.round(expected_area, 3)
     threshold = {0, ea}
 
+    ## with the spatial index only the nearby polygons are checked, the result is the same as checking all of them
+    if tree is not None:
+        nearby = np.unique(np.concatenate([tree.query(poly2) for poly2 in polygons2]))
+        polygons1 = [polygons1[n] for n in nearby]
+
     ## map(prep, polygons1) is used to check the overlap much faster lowering the computing time, it is a function of shapely
     for poly1, prepared_poly1 in zip(polygons1, map(prep, polygons1)):
         for poly2 in polygons2:
@@ -54,185 +69,502 @@ def check_overlap(polygons1, polygons2, expected_area):
 
     return True
 
-def wrapper_base(args, use_alt=False):
+def check_clearance(new_points, vertex_tree, side, tol=1e-3):
     """
-    Function used for paralelization to generate points of the quasicrystal
+    Checks the distances of the vertices of a new tile, in a square-triangle tiling two different vertices are at least one
+    side apart, so every new vertex has to coincide with a placed vertex or keep this distance from all placed and new vertices.
+    The pairwise overlap areas of check_overlap cannot see a tile shifted by a fraction of a side or stacked over several
+    polygons, this check rejects such tiles
 
     Parameters:
-        use_alt (Boolean) - allows the usage of square points generation
-        args:
-            triplet (numpy.ndarray) - idices of three points used for generation
-            temp (numpy.ndarray) - temporary points used to choose the triplet 
-            side (float) - lattice parameter
-            polygons (numpy.ndarray) - array of Polygon class objects that are used from previous steps
-            expected_area (float) - allowed overlap area
+        new_points (numpy.ndarray) - vertices of the new polygons
+        vertex_tree (scipy.spatial.cKDTree) - KD-tree of the vertices of the placed polygons
+        side (float) - lattice parameter
+        tol (float) - relative tolerance of the distances
     """
-    triplet, temp, side, polygons, expected_area = args
-    p1, p2, p3 = temp[list(triplet)]
+    d, _ = vertex_tree.query(new_points)
+    if np.any((d > tol * side) & (d < (1 - tol) * side)):
+        return False
+    tree = cKDTree(new_points)
+    close = tree.sparse_distance_matrix(tree, (1 - tol) * side, output_type='ndarray')
+    return not np.any(close['v'] > tol * side)
+
+def place_tile(pp, peak, polygons, expected_area, tree=None, stats=None, vertex_tree=None, side=1):
+    """
+    Rotates a generated tile, checks the distances of its vertices and its overlap with the polygons and selects its new
+    temporary points, returns None if the tile is rejected. The new temporary points are merged into the stored ones by
+    generate_quasicrystal
 
-    ## Point generation
-    if use_alt:
-        pp, peak = bp2(np.vstack((p1, p2, p3)), side)
-        if not isinstance(pp, np.ndarray):
-            return None
-    else:
-        for orientation in [1, -1]:
-            pp, peak = bp(np.vstack((p1, p2, p3)), side, orientation)
-            if isinstance(pp, np.ndarray):
-                break
-        else:
-            return None
+    Parameters:
+        pp (numpy.ndarray) - eight points of the generated tile
+        peak (numpy.ndarray) - peak point of the triplet used for the generation
+        polygons (numpy.ndarray) - array of Polygon class objects that are used from previous steps
+        expected_area (float) - allowed overlap area
+        tree (shapely.STRtree) - spatial index of polygons
+        stats (dict) - counters and times of the search, see new_stats
+        vertex_tree (scipy.spatial.cKDTree) - KD-tree of the placed vertices, the distances are not checked if None
+        side (float) - lattice parameter
+    """
+    t = time.perf_counter()
 
     ## Rotation of the points in respect to symetry and making temporary polygons
     pp_all = rp(pp)
+
+    ## Vertex distance check, it is cheaper than the overlap check and catches the tiles the overlap areas cannot
+    if vertex_tree is not None and not check_clearance(pp_all, vertex_tree, side):
+        if stats is not None:
+            stats['overlap_s'] += time.perf_counter() - t
+            stats['rejected_clearance'] += 1
+        return None
+
     new_polygons = [Polygon(pp_all[i:i+8]) for i in (0, 8, 40)]
 
     ## Polygon overlap check
-    if not check_overlap(polygons, new_polygons, expected_area):
+    overlaps = not check_overlap(polygons, new_polygons, expected_area, tree)
+    if stats is not None:
+        stats['overlap_s'] += time.perf_counter() - t
+        stats['rejected_overlap'] += overlaps
+    if overlaps:
         return None
 
-    ## adjusting new_temporary points to roughly the first quadrant and deleting the peak point from the selection
-    new_temp = temp[~np.all(np.abs(temp - peak) < 1e-6, axis=1)]
+    ## adjusting new_temporary points to roughly the first quadrant
     mask = (pp_all[:, 0] > 0) & (pp_all[:, 1] >= pp_all[:, 0] / 10) & (pp_all[:, 1] < 10 * pp_all[:, 0])
-    new_temp = sb(dedup_preserve_order(np.vstack((new_temp, pp_all[mask])), 6))
 
     return {
         'pp_all': pp_all,
-        'new_temp': new_temp,
+        'new_temp': pp_all[mask],
         'new_polygons': new_polygons,
-        'new_point_count': len(new_temp),
+        'peak': peak,
+    }
+
+def signature_triplets(temp, sides):
+    """
+    Indices of the triplets of temp with the side lengths of a tile as an array of shape (K, 3), in the order of
+    itertools.combinations, so the triplets of the points closest to the origin come first. Only the pairs of points within the
+    longest side are found with a KD-tree and each long pair is closed by the common neighbours of its ends, so the work grows
+    with the number of points and their neighbours instead of with all C(n, 3) triplets
+
+    Parameters:
+        temp (numpy.ndarray) - temporary points sorted by the distance from the origin
+        sides (numpy.ndarray) - side lengths (a, a, long) from quasi_tiling.triplet_sides
+    """
+    n = len(temp)
+    short, long = sides[0], sides[2]
+    ## the same tolerance as the check of the side lengths in quasi_tiling, so no accepted triplet is missed
+    tol_short, tol_long = 1e-8 + 1e-5 * np.abs(short), 1e-8 + 1e-5 * np.abs(long)
+    pairs = cKDTree(temp).query_pairs(max(short + tol_short, long + tol_long), output_type='ndarray')
+    r = np.sqrt(np.sum((temp[pairs[:, 0]] - temp[pairs[:, 1]])**2, axis=1))
+    short_pairs = pairs[np.abs(r - short) <= tol_short]
+    long_pairs = pairs[np.abs(r - long) <= tol_long]
+    if len(short_pairs) == 0 or len(long_pairs) == 0:
+        return np.empty((0, 3), dtype=np.int64)
+
+    ## neighbours along the short sides of every point, grouped by the point, and the sorted keys i*n + j (i < j) of the sides
+    src = np.concatenate((short_pairs[:, 0], short_pairs[:, 1]))
+    dst = np.concatenate((short_pairs[:, 1], short_pairs[:, 0]))[np.argsort(src, kind='stable')]
+    degree = np.bincount(src, minlength=n)
+    first = np.cumsum(degree) - degree
+    short_keys = np.sort(short_pairs[:, 0] * n + short_pairs[:, 1])
+
+    ## the third point is a short neighbour of one end of the long side that is also a short neighbour of the other end
+    u, w = long_pairs[:, 0], long_pairs[:, 1]
+    counts = degree[u]
+    owner = np.repeat(np.arange(len(u)), counts)
+    v = dst[np.repeat(first[u], counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)]
+    w = w[owner]
+    keys = np.minimum(v, w) * n + np.maximum(v, w)
+    found = short_keys[np.minimum(np.searchsorted(short_keys, keys), len(short_keys) - 1)] == keys
+
+    triplets = np.sort(np.stack((u[owner][found], w[found], v[found]), axis=1), axis=1)
+    keys = np.unique((triplets[:, 0] * n + triplets[:, 1]) * n + triplets[:, 2])
+    return np.stack((keys // (n * n), keys // n % n, keys % n), axis=1)
+
+def new_stats():
+    """
+    Empty counters and times of the search of one cycle, the times are summed over the worker processes
+    """
+    return {
+        'evaluated': 0,
+        'rejected_signature': 0,
+        'rejected_backward': 0,
+        'rejected_overlap': 0,
+        'rejected_clearance': 0,
+        'enumeration_s': 0.0,
+        'geometry_s': 0.0,
+        'overlap_s': 0.0,
+        'dedup_s': 0.0,
     }
 
-def generate_quasicrystal(cycles, side):
+def evaluate_triplets(triplets, temp, side, polygons, expected_area, use_alt=False, keep_going=None, tree=None,
+                      stats=None, vertex_tree=None):
+    """
+    Generates the tiles of all triplets at once and returns the result of the first one that passes the overlap check or None
+
+    Parameters:
+        triplets (numpy.ndarray) - indices of the triplets of shape (K, 3)
+        temp (numpy.ndarray) - temporary points used to choose the triplet
+        side (float) - lattice parameter
+        polygons (numpy.ndarray) - array of Polygon class objects that are used from previous steps
+        expected_area (float) - allowed overlap area
+        use_alt (Boolean) - allows the usage of square points generation
+        keep_going (function) - called before every overlap check, the evaluation stops when it returns False
+        tree (shapely.STRtree) - spatial index of polygons
+        stats (dict) - counters and times of the search, see new_stats
+        vertex_tree (scipy.spatial.cKDTree) - KD-tree of the placed vertices for check_clearance
+    """
+    t = time.perf_counter()
+    candidates = temp[triplets]
+
+    ## Point generation, the validity of bp does not depend on the orientation so the first orientation with a valid tile wins
+    if use_alt:
+        tiles, peaks, valid, backward = bp2_batch(candidates, side)
+    else:
+        for orientation in [1, -1]:
+            tiles, peaks, valid, backward = bp_batch(candidates, side, orientation)
+            if valid.any():
+                break
+    if stats is not None:
+        stats['geometry_s'] += time.perf_counter() - t
+        stats['evaluated'] += len(triplets)
+        stats['rejected_backward'] += int(backward.sum())
+        stats['rejected_signature'] += int(len(triplets) - valid.sum() - backward.sum())
+
+    for k in np.flatnonzero(valid):
+        if keep_going is not None and not keep_going():
+            return None
+        result = place_tile(tiles[k], peaks[k], polygons, expected_area, tree, stats, vertex_tree, side)
+        if result:
+            return result
+    return None
+
+## State of a worker process of the generator pool, the cycle state is loaded once per cycle from the file written by
+# generate_quasicrystal and the shared token tells the worker which cycle and phase is still wanted
+_worker = {'token': None, 'path': None}
+
+def _init_worker(token):
+    _worker['token'] = token
+
+def _load_cycle_state(path, stats):
+    ## loads temp, polygons and the candidate triplets only when the worker sees a new cycle, the spatial index of the
+    # polygons and the KD-tree of their vertices are built once per cycle here
+    if _worker['path'] != path:
+        t = time.perf_counter()
+        with np.load(path) as data:
+            temp = data['temp']
+            vertices = data['polygons']
+            triplets = {True: data['triplets_alt'], False: data['triplets']}
+        polygons = [Polygon(v) for v in vertices]
+        _worker.update(
+            path=path,
+            temp=temp,
+            polygons=polygons,
+            tree=STRtree(polygons),
+            vertex_tree=cKDTree(vertices.reshape(-1, 2)),
+            triplets=triplets,
+        )
+        stats['enumeration_s'] += time.perf_counter() - t
+    return _worker
+
+def _evaluate_range(path, token, start, stop, side, expected_area, use_alt):
+    ## task of the pool, evaluates the triplets start:stop of the cycle stored at path while the token is still current,
+    # returns the result and the counters of the task
+    stats = new_stats()
+    shared = _worker['token']
+    if shared.value != token:
+        return None, stats
+    try:
+        state = _load_cycle_state(path, stats)
+    except FileNotFoundError:
+        return None, stats
+    result = evaluate_triplets(state['triplets'][use_alt][start:stop], state['temp'], side, state['polygons'], expected_area,
+                               use_alt, lambda: shared.value == token, state['tree'], stats, state['vertex_tree'])
+    return result, stats
+
+def _search(executor, token, state_path, n_triplets, chunk, side, expected_area, use_alt):
+    """
+    Submits the triplet ranges of one search phase to the pool and returns the valid result of the range with the lowest
+    start, the same triplet as the serial search whichever task finishes first, and the counters of all the tasks that ran
+
+    Parameters:
+        executor (ProcessPoolExecutor) - pool of the generation
+        token (multiprocessing.Value) - shared token, the tasks stop when it changes
+        state_path (str) - file with the state of the cycle
+        n_triplets (int) - number of triplets in the cycle
+        chunk (int) - number of triplets evaluated by one task
+        side (float) - lattice parameter
+        expected_area (float) - allowed overlap area
+        use_alt (Boolean) - allows the usage of square points generation
+    """
+    token.value += 1
+    futures = [executor.submit(_evaluate_range, state_path, token.value, s, s + chunk, side, expected_area, use_alt)
+               for s in range(0, n_triplets, chunk)]
+    best = None
+    for future in as_completed(futures):
+        i = futures.index(future)
+        if not future.cancelled() and (best is None or i < best) and future.result()[0]:
+            ## the later ranges can not hold the first valid triplet any more, the earlier ones still can
+            best = i
+            for later in futures[i + 1:]:
+                later.cancel()
+        if best is not None and all(earlier.done() for earlier in futures[:best]):
+            break
+    result = futures[best].result()[0] if best is not None else None
+
+    ## the pending tasks are cancelled and the running ones stop at their next check of the token, they are waited for so that
+    # their counters are complete and nothing of this phase runs during the next one
+    token.value += 1
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+    stats = new_stats()
+    for future in futures:
+        if not future.cancelled():
+            for key, value in future.result()[1].items():
+                stats[key] += value
+    return result, stats
+
+def save_checkpoint(path, cycle, side, points, temp, vertices):
+    """
+    Saves the state of the generation after a cycle into a compressed .npz file, the file is first written next to the
+    target and then renamed, so an interrupted write never leaves a broken checkpoint
+
+    Parameters:
+        path (str) - path of the checkpoint file
+        cycle (int) - index of the last finished cycle
+        side (float) - lattice parameter
+        points (numpy.ndarray) - generated points
+        temp (numpy.ndarray) - temporary points used to choose the triplets
+        vertices (numpy.ndarray) - vertices of all placed polygons of shape (M, 8, 2)
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, cycle=cycle, side=side, points=points, temp=temp, vertices=vertices)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """
+    Loads the state of the generation saved by save_checkpoint as a dictionary
+
+    Parameters:
+        path (str) - path of the checkpoint file
+    """
+    with np.load(path) as data:
+        return {
+            'cycle': int(data['cycle']),
+            'side': float(data['side']),
+            'points': data['points'],
+            'temp': data['temp'],
+            'vertices': data['vertices'],
+        }
+
+def _emit(event, on_cycle, log_path):
+    ## passes the event of a cycle to the callback and appends it as one line of JSON to the log file
+    if on_cycle is not None:
+        on_cycle(event)
+    if log_path is not None:
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(event) + '\n')
+
+def generate_quasicrystal(cycles, side, workers=None, chunk=1024, checkpoint=None, checkpoint_every=1, state=None,
+                          on_cycle=None, log_path=None):
     """
     Manages the generation of the quasicrystal, logs the time spent, the paralelization is made in this function
 
     Parameters:
         cycles (int) - number of generation cycles
         side (float) - lattice parameter
+        workers (int) - number of worker processes, all cores by default
+        chunk (int) - number of triplets evaluated by one task of the pool
+        checkpoint (str) - path of the checkpoint file, no checkpoints are written if None
+        checkpoint_every (int) - number of cycles between two checkpoints, the last cycle is always saved
+        state (dict) - state from load_checkpoint to continue from, the generation continues up to the total number of cycles
+        on_cycle (function) - called with the event dictionary of every cycle
+        log_path (str) - the event of every cycle is appended to this file as one line of JSON
+
+    The event of a cycle contains the number of enumerated candidate triplets, of the triplets pruned by the neighbour search
+    and of the evaluated triplets, the rejections by reason (distance signature, backward orientation, overlap, vertex
+    clearance), whether the fallback to bp was needed, the sizes of the arrays and the times in seconds: 'state' writing the
+    cycle state, 'pool' wall time of the search in the pool, 'enumeration' finding the candidates plus loading them in the
+    workers, 'geometry' and 'overlap' (with the vertex clearance) summed over the workers, 'dedup' merging the new points into
+    the stores and 'cycle' the wall time of the whole cycle
+
+    Every placed tile passes check_overlap and check_clearance, the generation stops at the first cycle without such a tile
     """
 
     start_time = time.time()
 
-    ## The next part is used to plot the starting geometry as it is the same each time
-    base_triangle = np.array([[0, 0], [1, 0], [1 + np.sqrt(3) / 2, 0.5]])
-    temp, peak = bp(base_triangle, side, 1)
-    points = rp(temp)
-
-    polygons = [Polygon(points[i:i+8]) for i in (0, 8, 40)]
-    temp = dedup_preserve_order(temp[~np.all(np.abs(temp - peak) < 1e-6, axis=1)], 6)
-    temp = sb(temp)
-    points = dedup_preserve_order(points, 4)
+    ## The points and the temporary points are kept in stores that deduplicate the inserted points and keep the temporary points
+    # sorted by the distance from the origin, so a cycle only handles its new points
+    if state is None:
+        ## The next part is used to plot the starting geometry as it is the same each time
+        base_triangle = np.array([[0, 0], [1, 0], [1 + np.sqrt(3) / 2, 0.5]])
+        temp, peak = bp(base_triangle, side, 1)
+        points = rp(temp)
+
+        vertices = np.stack([points[i:i+8] for i in (0, 8, 40)])
+        temp_store = PointStore(temp, 6, side)
+        temp_store.remove(peak)
+        point_store = PointStore(points, 4, side)
+        start = 0
+    else:
+        vertices = state['vertices']
+        temp_store = PointStore(state['temp'], 6, side)
+        point_store = PointStore(state['points'], 4, side)
+        start = state['cycle'] + 1
+    polygons = [Polygon(v) for v in vertices]
 
     expected_area = np.sqrt(3) / 4 * side
 
-    ## Cycles of generation
-    for i in range(cycles):
-        print(f'\n{"#" * 80}\nCycle {i}')
-        combos = list(combinations(range(len(temp)), 3))
-        args_list = [(triplet, temp, side, polygons, expected_area) for triplet in combos]
-
-        results = []
-
-        ## Paralelization of the program for faster checking, the library does the thread management itself, is usefull for the loops
-        with ProcessPoolExecutor() as executor:
-            futures = [executor.submit(wrapper_base, args, True) for args in args_list]
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    results.append(result)
-                    break
-
-        ## Paralelization for the other point generation
-        if not results:
-            print('Falling back to standard bp')
-            with ProcessPoolExecutor() as executor:
-                futures = [executor.submit(wrapper_base, args, False) for args in args_list]
-                for future in as_completed(futures):
-                    result = future.result()
-                    if result:
-                        results.append(result)
-                        break
-
-        ## Checks if there are any valid results and updates the used parameters, the code could be cleaned up so that results are not
-        # useed because the list is redundant, feel free to do that
-        if results:
-   
-            best_result = results[0]
-            new_points = best_result['pp_all']
-            new_temp = best_result['new_temp']
-            new_polygons = best_result['new_polygons']
-
-            points = np.vstack((points, new_points))
-            temp = np.vstack((temp, new_temp))
-            polygons.extend(new_polygons)
-
-            points = dedup_preserve_order(points, 4)
-            temp = dedup_preserve_order(temp, 6)
-
-            ## clears first few values from the lists, it doesn't affect the generation if it is not higher than 2 and speeds it up
-            temp = sb(temp)[2:]
-
-            ## clears the polygons in case the amount gets too big, if you want to generate high number of generation this will
-            # this will break the program
-            if len(polygons) > 50:
-                polygons = polygons[-50:]
-
-
-            print(f"Added new structure. Total polygons: {len(polygons)}, temp points: {len(temp)}")
-        else:
-            print(f"No valid combination found in cycle {i}")
-            break
-        elapsed = time.time() - start_time
-        print(f"\nCompleted in {elapsed:.2f} seconds.")
-        yield i, dedup_preserve_order(points, 4), temp, polygons
+    ## One pool is used for all cycles, the state of each cycle is written once to a file that every worker loads once and the
+    # tasks only carry ranges of the candidate triplets. The shared token cancels the outstanding tasks after the first valid result
+    token = multiprocessing.Value('q', 0)
+    with tempfile.TemporaryDirectory() as state_dir, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(token,)) as executor:
+
+        ## Cycles of generation
+        for i in range(start, cycles):
+            print(f'\n{"#" * 80}\nCycle {i}')
+            cycle_start = time.perf_counter()
+            state_path = os.path.join(state_dir, f'cycle_{i}.npz')
+            temp = temp_store.ordered()
+
+            ## only the triplets with the side lengths of the tiles are candidates, in the order of the distance from the origin
+            triplets = {use_alt: signature_triplets(temp, triplet_sides(side, use_alt)) for use_alt in (True, False)}
+            enumeration_time = time.perf_counter() - cycle_start
+            np.savez(state_path, temp=temp, polygons=vertices, triplets_alt=triplets[True], triplets=triplets[False])
+            state_time = time.perf_counter() - cycle_start - enumeration_time
+
+            ## Paralelization of the program for faster checking, the square points generation is tried first
+            result, stats = _search(executor, token, state_path, len(triplets[True]), chunk, side, expected_area, True)
+
+            ## Paralelization for the other point generation
+            fallback = not result
+            if fallback:
+                print('Falling back to standard bp')
+                result, fallback_stats = _search(executor, token, state_path, len(triplets[False]), chunk, side,
+                                                 expected_area, False)
+                for key, value in fallback_stats.items():
+                    stats[key] += value
+            os.remove(state_path)
+            pool_time = time.perf_counter() - cycle_start - enumeration_time - state_time
+            stats['enumeration_s'] += enumeration_time
+
+            all_triplets = len(temp) * (len(temp) - 1) * (len(temp) - 2) // 6
+            phases = (True, False) if fallback else (True,)
+
+            ## Checks if there is a valid result and updates the used parameters
+            if result:
+                new_points = result['pp_all']
+                new_polygons = result['new_polygons']
+
+                polygons.extend(new_polygons)
+                vertices = np.concatenate((vertices, np.stack([new_points[k:k+8] for k in (0, 8, 40)])))
+
+                ## the peak point stays among the temporary points, as it did when the merged arrays were deduplicated
+                t = time.perf_counter()
+                point_store.insert(new_points)
+                temp_store.insert(result['new_temp'])
+
+                ## clears first few values from the lists, it doesn't affect the generation if it is not higher than 2 and speeds it up
+                temp_store.pop_closest(2)
+                stats['dedup_s'] += time.perf_counter() - t
+
+                print(f"Added new structure. Total polygons: {len(polygons)}, temp points: {len(temp_store)}")
+            else:
+                print(f"No valid combination found in cycle {i}")
+
+            _emit({
+                'cycle': i,
+                'found': bool(result),
+                'fallback': fallback,
+                'triplets_enumerated': sum(len(triplets[use_alt]) for use_alt in phases),
+                'triplets_pruned': sum(all_triplets - len(triplets[use_alt]) for use_alt in phases),
+                'triplets_evaluated': stats['evaluated'],
+                'rejected': {
+                    'signature': stats['rejected_signature'],
+                    'backward': stats['rejected_backward'],
+                    'overlap': stats['rejected_overlap'],
+                    'clearance': stats['rejected_clearance'],
+                },
+                'time': {
+                    'state': state_time,
+                    'pool': pool_time,
+                    'enumeration': stats['enumeration_s'],
+                    'geometry': stats['geometry_s'],
+                    'overlap': stats['overlap_s'],
+                    'dedup': stats['dedup_s'],
+                    'cycle': time.perf_counter() - cycle_start,
+                },
+                'sizes': {
+                    'points': len(point_store),
+                    'temp': len(temp_store),
+                    'polygons': len(polygons),
+                },
+            }, on_cycle, log_path)
+            if not result:
+                break
+            if checkpoint and ((i + 1) % checkpoint_every == 0 or i == cycles - 1):
+                save_checkpoint(checkpoint, i, side, point_store.points, temp_store.ordered(), vertices)
+            elapsed = time.time() - start_time
+            print(f"\nCompleted in {elapsed:.2f} seconds.")
+            yield i, point_store.points, temp_store.ordered(), polygons
 
-def quasicrystal(cycles, side):
+def quasicrystal(cycles, side, workers=None, checkpoint=None, checkpoint_every=1, log_path=None):
     """
     Main call function for quasicrystal generation
 
     Parameters:
         cycles (int) - number of generation cycles
         side (float) - lattice parameter
+        workers (int) - number of worker processes, all cores by default
+        checkpoint (str) - path of the checkpoint file, no checkpoints are written if None
+        checkpoint_every (int) - number of cycles between two checkpoints
+        log_path (str) - the events of the cycles are appended to this file as JSON lines, see generate_quasicrystal
     """
     result = None
-    for result in generate_quasicrystal(cycles, side):
+    for result in generate_quasicrystal(cycles, side, workers, checkpoint=checkpoint, checkpoint_every=checkpoint_every,
+                                        log_path=log_path):
         pass
     if result:
         _, points, temp, _ = result
         return points, temp
     return None, None
 
+def resume_quasicrystal(checkpoint, cycles, workers=None, checkpoint_every=1, log_path=None):
+    """
+    Continues the generation from a checkpoint up to the total number of cycles and keeps writing the same checkpoint, a
+    finished run can be extended by calling it with a higher number of cycles
+
+    Parameters:
+        checkpoint (str) - path of the checkpoint file
+        cycles (int) - total number of generation cycles, including the cycles already in the checkpoint
+        workers (int) - number of worker processes, all cores by default
+        checkpoint_every (int) - number of cycles between two checkpoints
+        log_path (str) - the events of the cycles are appended to this file as JSON lines, see generate_quasicrystal
+    """
+    state = load_checkpoint(checkpoint)
+    result = None
+    for result in generate_quasicrystal(cycles, state['side'], workers, checkpoint=checkpoint,
+                                        checkpoint_every=checkpoint_every, state=state, log_path=log_path):
+        pass
+    if result:
+        _, points, temp, _ = result
+        return points, temp
+    return dedup_preserve_order(state['points'], 4), state['temp']
+
 
 def hexagonal(rows, cols, side):
     """
-    Generates points for hexagonal grid
+    Generates points for hexagonal grid, kept here for the older scripts, see lattices.hexagonal_rect
 
     Parameters:
         rows (int) - number of rows in the generation
         cols (int) - number of columns in the generation
         side (float) - lattice parameter
     """
-
-    half_sqrt3_side = (np.sqrt(3) / 2) * side
-    points = []
-
-    for r in range(rows // 2):
-        y = r * half_sqrt3_side
-        x_offset = side / 2 if r % 2 else 0
-        for c in range(cols // 2):
-            x = c * side + x_offset
-
-            # Avoid duplicate points at (0,0)
-            if x == 0 and y == 0:
-                points.append([0, 0])
-            else:
-                points.extend([
-                    [ x,  y],
-                    [-x,  y],
-                    [ x, -y],
-                    [-x, -y]
-                ])
-    return np.unique(np.array(points),axis = 0)
+    return lt.hexagonal_rect(rows, cols, side)
 
 
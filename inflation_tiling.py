@@ -0,0 +1,95 @@
+import numpy as np
+from quasi_tiling import sort_by_distance_from_origin as sb
+
+## This code generates the 12-fold square-triangle tiling deterministically by inflation instead of the search in
+# generate_mesh_bcup2. The tiling is scaled by lam = 2 + sqrt(3) and every vertex of the scaled tiling is replaced by a dodecagon
+# of side 1 made of 6 squares and 12 triangles. Two dodecagons at the ends of a scaled edge share one of their sides, so the
+# only gaps left are one triangle in each scaled triangle and one unit of quasi_tiling (a square with triangles on all its
+# sides) in each scaled square. The gaps have no vertices of their own, so the new vertices are just the dodecagon vertices
+# around the scaled old ones and every generation is linear in the number of vertices
+
+## The vertices are stored exactly as integer coordinates in the basis e_0 ... e_3, e_k = (cos 30k, sin 30k), every e_j of the
+# 12-fold star is an integer combination of them because e_4 = e_2 - e_0 and e_(j+6) = -e_j
+
+
+def star_vector(j):
+    """
+    Integer coordinates of the unit vector e_j = (cos 30j, sin 30j) in the basis e_0 ... e_3
+
+    Parameters:
+        j (int) - index of the direction
+    """
+    j = j % 12
+    if j >= 6:
+        return -star_vector(j - 6)
+    v = np.zeros(4, dtype=np.int64)
+    if j < 4:
+        v[j] = 1
+    else:
+        ## e_4 = e_2 - e_0 and e_5 = e_3 - e_1
+        v[j - 2] = 1
+        v[j - 4] = -1
+    return v
+
+## Cartesian coordinates of the basis
+BASIS = np.array([[np.cos(np.radians(30 * k)), np.sin(np.radians(30 * k))] for k in range(4)])
+
+## Multiplication by lam = 2 + sqrt(3) in the integer coordinates, sqrt(3) e_k = e_(k+1) + e_(k-1)
+INFLATION = np.stack([2 * star_vector(k) + star_vector(k + 1) + star_vector(k - 1) for k in range(4)], axis=1)
+
+## Vertices of the dodecagon decomposed into 6 triangles around the center, 6 squares on the sides of the central hexagon
+# and 6 triangles between the squares
+DODECAGON = np.array([np.zeros(4, dtype=np.int64)]
+                     + [star_vector(2 * k) for k in range(6)]
+                     + [star_vector(j) + star_vector(j + 1) for j in range(12)])
+
+def _unique_rows(coords):
+    ## exact deduplication of the integer coordinates, the four coordinates are packed into one integer key
+    low = coords.min(axis=0)
+    span = coords.max(axis=0) - low + 1
+    key = np.zeros(coords.shape[0], dtype=np.int64)
+    for k in range(4):
+        key = key * span[k] + (coords[:, k] - low[k])
+    _, idx = np.unique(key, return_index=True)
+    return coords[idx]
+
+def inflate(coords):
+    """
+    One inflation step, returns the integer coordinates of the vertices of the next generation
+
+    Parameters:
+        coords (numpy.ndarray) - integer coordinates of the vertices of shape (V, 4)
+    """
+    scaled = coords @ INFLATION.T
+    return _unique_rows((scaled[:, None, :] + DODECAGON[None, :, :]).reshape(-1, 4))
+
+def to_cartesian(coords, side=1):
+    """
+    Converts the integer coordinates to the points in the plane
+
+    Parameters:
+        coords (numpy.ndarray) - integer coordinates of the vertices of shape (V, 4)
+        side (float) - lattice parameter
+    """
+    return side * (coords @ BASIS)
+
+def inflation_tiling(generations, side=1, radius=None):
+    """
+    Generates the vertices of the square-triangle tiling by inflation, each generation multiplies the number of vertices by
+    about lam^2 = 7 + 4 sqrt(3) (19, 289, 4123, 57817, 806851 vertices), returns the points sorted by the distance from the
+    origin in the same format as the points of generate_mesh_bcup2.quasicrystal
+
+    Parameters:
+        generations (int) - number of inflation steps
+        side (float) - lattice parameter
+        radius (float) - only the points closer to the origin are kept if given
+    """
+    coords = np.zeros((1, 4), dtype=np.int64)
+    for g in range(generations):
+        coords = inflate(coords)
+        print(f'Inflation generation {g}: {len(coords)} vertices')
+
+    points = to_cartesian(coords, side)
+    if radius is not None:
+        points = points[np.linalg.norm(points, axis=1) <= radius]
+    return sb(points)
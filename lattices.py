@@ -0,0 +1,126 @@
+import numpy as np
+from quasi_tiling import sort_by_distance_from_origin as sb
+
+## Periodic reference point sets cropped to a disk, built directly as arrays. A lattice is given by its two basis vectors and the
+# motif of points inside one cell, the integer coordinates (n1, n2) of all cells that can reach the disk are bounded through the
+# inverse of the basis, so every motif point is one broadcast sum over the (n1, n2) grid followed by the disk mask. The number of
+# evaluated candidates is a constant factor above the number of kept points, no Python loop runs per point and no deduplication
+# is needed because the motif points are different modulo the lattice. The output has the format of the point files, an array
+# of shape (P, 2) sorted by the distance from the origin, and can be passed to add_gauss.add_points directly
+#
+# The square-triangle approximant is the snub square tiling 3.3.4.3.4, the 2D layer of the sigma phase: a square cell of side
+# a*(sqrt(2) + sqrt(6))/2 holding four vertices, the corners of a square of side a rotated by 15 degrees. It has the same two
+# tiles and edge length as the generated quasicrystal, so it is the periodic counterpart of the 12-fold tiling
+
+
+def lattice_disk(basis, motif, maxdist, sort=True):
+    """
+    Points of the periodic set basis x motif inside the disk of radius maxdist around the origin
+
+    Parameters:
+        basis (numpy.ndarray) - basis vectors of the lattice as the rows of a (2, 2) array
+        motif (numpy.ndarray) - points of one cell of shape (M, 2)
+        maxdist (float) - radius of the disk
+        sort (Boolean) - sorts the points by the distance from the origin
+    """
+    basis = np.asarray(basis, dtype=np.float64)
+    motif = np.atleast_2d(np.asarray(motif, dtype=np.float64))
+    if maxdist < 0:
+        raise ValueError(f'The radius of the disk has to be positive, got maxdist = {maxdist}')
+    if abs(np.linalg.det(basis)) < 1e-12:
+        raise ValueError('The basis vectors of the lattice are parallel')
+
+    ## the integer coordinates of a point p are p @ inv(basis), so |n_i| is at most |p| times the norm of the column i of inv(basis)
+    reach = maxdist + np.max(np.linalg.norm(motif, axis=1))
+    bound = np.ceil(reach * np.linalg.norm(np.linalg.inv(basis), axis=0)).astype(np.int64)
+    n1 = np.arange(-bound[0], bound[0] + 1, dtype=np.float64)[:, None]
+    n2 = np.arange(-bound[1], bound[1] + 1, dtype=np.float64)[None, :]
+
+    ## the points on the circle are kept despite the rounding of their coordinates
+    limit = maxdist**2 * (1 + 1e-12)
+    blocks = []
+    for m in motif:
+        x = n1 * basis[0, 0] + n2 * basis[1, 0] + m[0]
+        y = n1 * basis[0, 1] + n2 * basis[1, 1] + m[1]
+        inside = x * x + y * y <= limit
+        blocks.append(np.stack((x[inside], y[inside]), axis=1))
+    points = np.concatenate(blocks)
+    return sb(points) if sort else points
+
+def hexagonal(maxdist, a=1, sort=True):
+    """
+    Hexagonal (triangular) lattice with lattice parameter a inside the disk of radius maxdist, the origin is a lattice point
+
+    Parameters:
+        maxdist (float) - radius of the disk
+        a (float) - lattice parameter
+        sort (Boolean) - sorts the points by the distance from the origin
+    """
+    return lattice_disk([[a, 0], [a / 2, a * np.sqrt(3) / 2]], [[0, 0]], maxdist, sort)
+
+def hexagonal_rect(rows, cols, side):
+    """
+    Hexagonal grid on the rectangle of rows x cols points centered at the origin, the reference grid of main.py and
+    batch_render (the origin is a lattice point, the rows are parallel to x). Sorted like np.unique, by x and then by y
+
+    Parameters:
+        rows (int) - number of rows in the generation
+        cols (int) - number of columns in the generation
+        side (float) - lattice parameter
+    """
+    half_sqrt3_side = (np.sqrt(3) / 2) * side
+
+    ## all rows at once, the odd rows are shifted by half a side and every point is mirrored into the four quadrants
+    r = np.arange(rows // 2)[:, None]
+    c = np.arange(cols // 2)[None, :]
+    x = (c * side + (r % 2) * (side / 2)).ravel()
+    y = np.broadcast_to(r * half_sqrt3_side, (rows // 2, cols // 2)).ravel()
+    points = np.concatenate([np.stack((sx * x, sy * y), axis=1) for sx, sy in ((1, 1), (-1, 1), (1, -1), (-1, -1))])
+    return np.unique(points, axis = 0)
+
+def square(maxdist, a=1, sort=True):
+    """
+    Square lattice with lattice parameter a inside the disk of radius maxdist, the origin is a lattice point
+
+    Parameters:
+        maxdist (float) - radius of the disk
+        a (float) - lattice parameter
+        sort (Boolean) - sorts the points by the distance from the origin
+    """
+    return lattice_disk([[a, 0], [0, a]], [[0, 0]], maxdist, sort)
+
+def sigma_phase(maxdist, a=1, sort=True):
+    """
+    Snub square tiling 3.3.4.3.4 (sigma phase approximant) with edge length a inside the disk of radius maxdist, every vertex
+    has five neighbours at the distance a and the origin is the center of a square
+
+    Parameters:
+        maxdist (float) - radius of the disk
+        a (float) - edge length of the squares and triangles
+        sort (Boolean) - sorts the points by the distance from the origin
+    """
+    cell = a * (np.sqrt(2) + np.sqrt(6)) / 2
+    angles = np.radians(15 + 45 + 90 * np.arange(4))
+    motif = a / np.sqrt(2) * np.stack((np.cos(angles), np.sin(angles)), axis=1)
+    return lattice_disk([[cell, 0], [0, cell]], motif, maxdist, sort)
+
+## Available periodic point sets by name
+LATTICES = {
+    'hexagonal': hexagonal,
+    'square': square,
+    'sigma': sigma_phase,
+}
+
+def lattice(name, maxdist, a=1, sort=True):
+    """
+    Periodic point set from LATTICES inside the disk of radius maxdist
+
+    Parameters:
+        name (str) - name of the point set from LATTICES
+        maxdist (float) - radius of the disk
+        a (float) - lattice parameter or edge length
+        sort (Boolean) - sorts the points by the distance from the origin
+    """
+    if name not in LATTICES:
+        raise ValueError(f"Unknown lattice '{name}', choose from {list(LATTICES)}")
+    return LATTICES[name](maxdist, a, sort)
@@ -1,17 +1,15 @@
 import os
 import glob
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.fft import fft2
-import generate_mesh_bcup2 as gm
-import add_gauss as ag
 
-## This file consists of two parts, each separated by exit() function so that they do not run simultaniously due to their complexity
-# and time needed for completion
+## This file consists of two parts, the functions analysis and generation, which do not run simultaniously due to their complexity
+# and time needed for completion. Running the file executes the analysis, both parts are also the 'render --show' and
+# 'generate --show' subcommands of cli.py. The heavy modules (matplotlib, shapely, scipy) are imported inside the functions, so
+# importing this file does not load them
 
-## The first part takes generated points from .txt files in points folder and adds gaussians to the points onto a map 1000x1000 or other
+## The first part takes generated points from .npy files in points folder and adds gaussians to the points onto a map 1000x1000 or other
 # specified accuracy. The program then shows the map and does a 2D fourier transform of the map, plots the FT and saves all the plot
-# Based on the furthest point in .txt file it makes a hexagonal grid and repeats the porces with the points of hexagonal grid
+# Based on the furthest point in .npy file it makes a hexagonal grid and repeats the porces with the points of hexagonal grid
 
 ## minimal time each plot is shown
 T = 0.5
@@ -20,123 +18,218 @@ T = 0.5
 sigmas = [0.02, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25,0.3]
 Ns = [1000] * len(sigmas)
 a = 1
-
-## Ensure base saving folder exists
-base_folder = 'Saved_figures'
-os.makedirs(base_folder, exist_ok=True)
-
-
-def dynamic_zoom_region(arr, threshold_ratio=0.1, padding=10):
-    ## Zoomes the FT to a range at which the main peaks are realized with a certain threshold ratio relative to the maximum value
-    max_val = np.max(arr)
-    mask = arr > (threshold_ratio * max_val)
-    coords = np.argwhere(mask)
-
-    if coords.size == 0:
-        # fallback to center square crop if no peaks found
-        center = np.array(arr.shape) // 2
-        half_size = min(arr.shape) // 10
-        return tuple(slice(center[i] - half_size, center[i] + half_size) for i in range(2))
-
-    top_left = np.maximum(coords.min(axis=0) - padding, 0)
-    bottom_right = np.minimum(coords.max(axis=0) + padding, np.array(arr.shape))
-
-    height = bottom_right[0] - top_left[0]
-    width = bottom_right[1] - top_left[1]
-    side = max(height, width)
-
-    center = (top_left + bottom_right) // 2
-    half_side = side // 2
-
-    start = np.maximum(center - half_side, 0)
-    end = np.minimum(start + side, np.array(arr.shape))
-
-    start = np.maximum(end - side, 0)
-
-    return tuple(slice(start[i], end[i]) for i in range(2))
-
-## For loop through the .txt files
-for txt_file in glob.glob(os.path.join("points","*.txt")):
-    points = np.loadtxt(txt_file, delimiter=",")
-    points = np.unique(np.round(points, 3), axis=0)
-
-    ## generating the hexagonal grid
-    maxdist = int(np.floor(np.max(np.linalg.norm(points, axis=1))))
-    H = 2 * maxdist
-    D = int(np.floor(4*maxdist/np.sqrt(3)))
-
-    hex_points = gm.hexagonal(D, H, a)
-
-    ## Make folder based in the filename
-    file_base = os.path.splitext(txt_file)[0]
-    file_folder = os.path.join(base_folder, file_base)
-    os.makedirs(file_folder, exist_ok=True)
-
-    ## For starting parameters make the plots
-    for sigma, N in zip(sigmas, Ns):
-        sigma_folder = os.path.join(file_folder, f"sigma_{sigma}")
-        os.makedirs(sigma_folder, exist_ok=True)
-
-        map1, x1, y1, extent1 = ag.add_points(hex_points, sigma, N)
-        map2, x2, y2, extent2 = ag.add_points(points, sigma, N)
-
-        plt.figure(figsize=(8, 6))
-        plt.imshow(map1, extent=extent1, origin='lower', cmap='hot')
-        plt.colorbar(label='Gaussian Intensity')
-        plt.title(f"Gaussian Map (Hexagonal grid): σ={sigma}, N={N}")
-        plt.xlabel("X")
-        plt.ylabel("Y")
-        plt.tight_layout()
-        plt.savefig(f"{sigma_folder}/hexmap_sigma{sigma}_N{N}.png")
-        plt.pause(T)
-        plt.close()
-
-        fft1 = fft2(map1)
-        fft1_mag = np.abs(np.fft.fftshift(fft1))
-        zoom_slice = dynamic_zoom_region(fft1_mag)
-        plt.figure(figsize=(8, 6))
-        plt.imshow(fft1_mag[zoom_slice], cmap='viridis')
-        plt.title(f"Zoomed FFT (Hexagonal grid): σ={sigma}, N={N}")
-        plt.xlabel("Freq X")
-        plt.ylabel("Freq Y")
-        plt.colorbar(label='Magnitude')
-        plt.tight_layout()
-        plt.savefig(f"{sigma_folder}/hexfft_zoomed_sigma{sigma}_N{N}.png")
-        plt.pause(T)
-        plt.close()
-
-        # Save point-based Gaussian map
-        plt.figure(figsize=(8, 6))
-        plt.imshow(map2, extent=extent2, origin='lower', cmap='hot')
-        plt.colorbar(label='Gaussian Intensity')
-        plt.title(f"Gaussian Map (Quasicrystal) ({txt_file}): σ={sigma}, N={N}")
-        plt.xlabel("X")
-        plt.ylabel("Y")
-        plt.tight_layout()
-        plt.savefig(f"{sigma_folder}/pointmap_sigma{sigma}_N{N}.png")
-        plt.pause(T)
-        plt.close()
-
-        # Save point-based FFT (zoomed)
-        fft2_res = fft2(map2)
-        fft2_mag = np.abs(np.fft.fftshift(fft2_res))
-        zoom_slice2 = dynamic_zoom_region(fft2_mag)
-        plt.figure(figsize=(8, 6))
-        plt.imshow(fft2_mag[zoom_slice2], cmap='viridis')
-        plt.title(f"Zoomed FFT (Quasicrystal) ({txt_file}): σ={sigma}, N={N}")
-        plt.xlabel("Freq X")
-        plt.ylabel("Freq Y")
-        plt.colorbar(label='Magnitude')
-        plt.tight_layout()
-        plt.savefig(f"{sigma_folder}/pointfft_zoomed_sigma{sigma}_N{N}.png")
-        plt.pause(T)
-        plt.close()
-exit()
-
-## Generates and plots the quasicrystal
-if __name__ == '__main__':
-    points, temp = gm.quasicrystal(35, 1)
-    np.savetxt('points/points1.txt', points, fmt='%.6f', delimiter=',')
+## rendering backend of add_gauss.add_points ('loop' is the slow reference, 'separable' or 'stencil' are fast)
+backend = 'stencil'
+## 'fft' transforms the Gaussian map, 'direct' evaluates the same spectrum straight from the points with structure_factor
+spectrum_mode = 'fft'
+## transform each point set once and derive all sigmas from it with sf.sigma_sweep, needs the same N for all sigmas
+sweep = True
+## 'crop' crops the full FFT around the peaks, 'czt' computes only the peak window at full resolution with the chirp-z transform
+zoom_mode = 'crop'
+## threads of the FFT (-1 uses all cores) and float32 instead of float64 transforms
+fft_workers = -1
+single_precision = False
+## saves the table of the Bragg peaks of every spectrum as .npy next to the figures and prints the 6- and 12-fold symmetry scores
+save_peaks = True
+## folder of the cache of the maps and spectra (None disables it), only new point files or parameters are computed again
+cache_folder = 'cache'
+
+
+def analysis(point_files=None, sigmas=sigmas, Ns=Ns, a=a, backend=backend, spectrum_mode=spectrum_mode, sweep=sweep,
+             zoom_mode=zoom_mode, fft_workers=fft_workers, single_precision=single_precision, save_peaks=save_peaks,
+             base_folder='Saved_figures', cache_folder=cache_folder):
+    """
+    Shows and saves the Gaussian maps and zoomed FFTs of the point files and of their hexagonal grids, the parameters are
+    described above
+
+    Parameters:
+        point_files (list) - paths of the .npy point files, all files of the points folder by default
+        base_folder (str) - folder of the saved figures
+        cache_folder (str) - folder of the cache of the maps and spectra, None disables the cache
+    """
+    import matplotlib.pyplot as plt
+    import generate_mesh_bcup2 as gm
+    import add_gauss as ag
+    import structure_factor as sf
+    import point_io as pio
+    import zoom_spectrum as zs
+    import fft_stage as fs
+    import bragg_peaks as bp
+    import result_cache as rc
+    from zoom_spectrum import dynamic_zoom_region
+
+    cache = rc.ResultCache(cache_folder) if cache_folder else None
+
+    ## Ensure base saving folder exists
+    os.makedirs(base_folder, exist_ok=True)
+
+    ## Old .txt point files are converted once to the binary format, which is saved already deduplicated
+    if point_files is None:
+        pio.convert_folder("points")
+        point_files = sorted(glob.glob(os.path.join("points","*.npy")))
+
+    ## For loop through the .npy files
+    for point_file in point_files:
+        points, meta = pio.load_points(point_file)
+
+        ## generating the hexagonal grid
+        maxdist = int(np.floor(meta.get('max_radius') or np.max(np.linalg.norm(points, axis=1))))
+        H = 2 * maxdist
+        D = int(np.floor(4*maxdist/np.sqrt(3)))
+
+        hex_points = gm.hexagonal(D, H, a)
+
+        ## Make folder based in the filename
+        file_base = os.path.splitext(point_file)[0]
+        file_folder = os.path.join(base_folder, file_base)
+        os.makedirs(file_folder, exist_ok=True)
+
+        use_sweep = sweep and len(set(Ns)) == 1
+        method = 'direct' if spectrum_mode == 'direct' else 'render'
+        ## the sweeps are only started when a sigma is missing in the cache
+        sweeps = {}
+
+        def compute(pts, sigma, N):
+            if use_sweep:
+                name = 'hex' if pts is hex_points else 'points'
+                if name not in sweeps:
+                    sweeps[name] = sf.sigma_sweep(pts, sigmas, Ns[0], backend, method, fft_workers, single_precision)
+                for sig, (map, x, y, extent), fft_mag in sweeps[name]:
+                    if sig == sigma:
+                        break
+            else:
+                map, x, y, extent = ag.add_points(pts, sigma, N, backend)
+                fft_mag = None
+                if spectrum_mode == 'direct':
+                    fft_mag = sf.fft_magnitude(pts, sigma, x, y)
+                elif zoom_mode == 'crop':
+                    ## the full FFT is only needed for cropping, 'czt' transforms the peak window of the map itself
+                    fft_mag = fs.shifted_magnitude(map, fft_workers, single_precision)
+            arrays = {'map': map, 'x': x, 'y': y, 'extent': np.array(extent)}
+            if fft_mag is not None:
+                arrays['fft_mag'] = fft_mag
+            return arrays
+
+        def maps(pts, pts_hash, sigma, N):
+            if cache is None:
+                arrays = compute(pts, sigma, N)
+            else:
+                ## a swept result depends on its reference width in the sweep (None when it is rendered on its own), not on
+                # the whole list of sigmas, so adding a sigma only recomputes the items whose reference changes
+                reference = False
+                if use_sweep:
+                    x, y, _ = ag.map_grid(pts, N)
+                    reference = sf.sweep_references(sigmas, x, y, method)[sigmas.index(sigma)]
+                    reference = None if reference is None else float(reference)
+                key = rc.cache_key(pts_hash, 'main.analysis', sigma=sigma, N=N, buffer=ag.BUFFER, backend=backend,
+                                   spectrum_mode=spectrum_mode, zoom_mode=zoom_mode, sweep=use_sweep, reference=reference,
+                                   precision='float32' if single_precision else 'float64')
+                arrays = cache.get_or_compute(key, lambda: compute(pts, sigma, N))
+            return arrays['map'], arrays['x'], arrays['y'], tuple(arrays['extent'].tolist()), arrays.get('fft_mag')
+
+        hex_hash = rc.point_hash(hex_points) if cache is not None else None
+        point_hash = rc.point_hash(points) if cache is not None else None
+
+        ## For starting parameters make the plots
+        for sigma, N in zip(sigmas, Ns):
+            sigma_folder = os.path.join(file_folder, f"sigma_{sigma}")
+            os.makedirs(sigma_folder, exist_ok=True)
+
+            map1, x1, y1, extent1, fft1_mag = maps(hex_points, hex_hash, sigma, N)
+            map2, x2, y2, extent2, fft2_mag = maps(points, point_hash, sigma, N)
+
+            plt.figure(figsize=(8, 6))
+            plt.imshow(map1, extent=extent1, origin='lower', cmap='hot')
+            plt.colorbar(label='Gaussian Intensity')
+            plt.title(f"Gaussian Map (Hexagonal grid): σ={sigma}, N={N}")
+            plt.xlabel("X")
+            plt.ylabel("Y")
+            plt.tight_layout()
+            plt.savefig(f"{sigma_folder}/hexmap_sigma{sigma}_N{N}.png")
+            plt.pause(T)
+            plt.close()
+
+            if zoom_mode == 'czt':
+                fft1_zoom, fx1, fy1 = zs.zoomed_spectrum(map1, x1, y1)
+                spec1, k1 = fft1_zoom, (2 * np.pi * fx1, 2 * np.pi * fy1)
+            else:
+                zoom_slice = dynamic_zoom_region(fft1_mag)
+                fft1_zoom = fft1_mag[zoom_slice]
+                spec1, k1 = fft1_mag, sf.fft_kgrid(x1, y1)
+            plt.figure(figsize=(8, 6))
+            plt.imshow(fft1_zoom, cmap='viridis')
+            plt.title(f"Zoomed FFT (Hexagonal grid): σ={sigma}, N={N}")
+            plt.xlabel("Freq X")
+            plt.ylabel("Freq Y")
+            plt.colorbar(label='Magnitude')
+            plt.tight_layout()
+            plt.savefig(f"{sigma_folder}/hexfft_zoomed_sigma{sigma}_N{N}.png")
+            plt.pause(T)
+            plt.close()
+
+            # Save point-based Gaussian map
+            plt.figure(figsize=(8, 6))
+            plt.imshow(map2, extent=extent2, origin='lower', cmap='hot')
+            plt.colorbar(label='Gaussian Intensity')
+            plt.title(f"Gaussian Map (Quasicrystal) ({point_file}): σ={sigma}, N={N}")
+            plt.xlabel("X")
+            plt.ylabel("Y")
+            plt.tight_layout()
+            plt.savefig(f"{sigma_folder}/pointmap_sigma{sigma}_N{N}.png")
+            plt.pause(T)
+            plt.close()
+
+            # Save point-based FFT (zoomed)
+            if zoom_mode == 'czt':
+                fft2_zoom, fx2, fy2 = zs.zoomed_spectrum(map2, x2, y2)
+                spec2, k2 = fft2_zoom, (2 * np.pi * fx2, 2 * np.pi * fy2)
+            else:
+                zoom_slice2 = dynamic_zoom_region(fft2_mag)
+                fft2_zoom = fft2_mag[zoom_slice2]
+                spec2, k2 = fft2_mag, sf.fft_kgrid(x2, y2)
+            plt.figure(figsize=(8, 6))
+            plt.imshow(fft2_zoom, cmap='viridis')
+            plt.title(f"Zoomed FFT (Quasicrystal) ({point_file}): σ={sigma}, N={N}")
+            plt.xlabel("Freq X")
+            plt.ylabel("Freq Y")
+            plt.colorbar(label='Magnitude')
+            plt.tight_layout()
+            plt.savefig(f"{sigma_folder}/pointfft_zoomed_sigma{sigma}_N{N}.png")
+            plt.pause(T)
+            plt.close()
+
+            if save_peaks:
+                for name, spec, k, (x, y) in (('hex', spec1, k1, (x1, y1)), ('point', spec2, k2, (x2, y2))):
+                    ## the chirp-z window oversamples the spectrum, its resolution is the pixel spacing of the full FFT
+                    kx, ky = sf.fft_kgrid(x, y)
+                    peaks = bp.extract_peaks(spec, *k, spacing=max(kx[1] - kx[0], ky[1] - ky[0]))
+                    bp.save_peaks(f"{sigma_folder}/{name}peaks_sigma{sigma}_N{N}.npy", peaks)
+                    print(f"{name} peaks: {len(peaks)}, symmetry scores: {bp.symmetry_scores(peaks)}")
+
+def generation(cycles=35, side=1, workers=None, output='points/points1.npy', checkpoint='points/checkpoint.npz', resume=False,
+               log_path=None):
+    """
+    Generates the quasicrystal, saves its points and plots them with the remaining temporary points
+
+    Parameters:
+        cycles (int) - total number of cycles
+        side (float) - lattice parameter
+        workers (int) - number of worker processes, all cores by default
+        output (str) - path of the saved .npy point file
+        checkpoint (str) - path of the checkpoint file, written every cycle
+        resume (Boolean) - continues the run saved in the checkpoint instead of starting a new one
+        log_path (str) - the events of the cycles are appended to this file as JSON lines
+    """
+    import matplotlib.pyplot as plt
+    import generate_mesh_bcup2 as gm
+    import point_io as pio
+
+    ## the state is saved every cycle, an interrupted run is continued with resume=True
+    if resume:
+        points, temp = gm.resume_quasicrystal(checkpoint, cycles, workers, log_path=log_path)
+    else:
+        points, temp = gm.quasicrystal(cycles, side, workers, checkpoint=checkpoint, log_path=log_path)
+    pio.save_points(output, points, side=side, cycles=cycles)
     fig, ax = plt.subplots(figsize=(8,8))
     ax.set_xlim(-12, 12)
 
@@ -146,6 +239,8 @@ if __name__ == '__main__':
     ax.plot(temp[:,0],temp[:,1],'x', color = 'red')
 
     plt.show()
-exit()
 
 
+## The execution under main is needed by the process pools of the generation and batch rendering
+if __name__ == '__main__':
+    analysis()
@@ -0,0 +1,209 @@
+import os
+import glob
+import json
+import argparse
+import numpy as np
+from scipy.spatial import cKDTree
+
+## Real space statistics of the point sets for comparing the quasicrystal with the hexagonal grid: the pair correlation function
+# g(r), the histograms of the bond lengths and of the angles between neighbouring bonds, and the counts of the vertex
+# configurations (the cyclic sequence of triangles 3 and squares 4 around a vertex, e.g. 3.3.3.4.4). All neighbours are found
+# with a KD-tree, so the cost grows with the number of points times their neighbours, and the points are handled in chunks so
+# that only the bonds of one chunk are in memory. Only the points far enough from the edge of the patch are used as centers
+#
+#     python pair_correlation.py [files] [--output pair_correlation.json] [--reference]
+
+
+def _compact_order(points, chunk):
+    ## order of the points by square cells holding about chunk points each, so that every chunk is a compact region and its
+    # KD-tree query only visits the nearby part of the full tree (the point files are sorted by radius, where a chunk is a ring)
+    low = points.min(axis=0)
+    span = np.maximum(points.max(axis=0) - low, 1e-12)
+    side = np.sqrt(span[0] * span[1] * chunk / len(points))
+    cells = np.floor((points - low) / side).astype(np.int64)
+    return np.lexsort((points[:, 0], cells[:, 0], cells[:, 1]))
+
+def pair_correlation(points, r_max=5, bins=250, chunk=8192, tree=None, radius=None):
+    """
+    Pair correlation function g(r) of the points, the distances to the neighbours closer than r_max are found for a chunk of
+    centers at a time and binned at once. Returns the centers of the bins and g
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        r_max (float) - largest distance
+        bins (int) - number of bins
+        chunk (int) - number of centers handled at once
+        tree (scipy.spatial.cKDTree) - KD-tree of the points, built if not given
+        radius (float) - radius of the patch, the largest distance of a point from the origin by default
+    """
+    tree = tree or cKDTree(points)
+    radius = radius or np.max(np.linalg.norm(points, axis=1))
+    edges = np.linspace(0, r_max, bins + 1)
+
+    ## the centers are the points whose whole disk of radius r_max lies inside the patch
+    centers = points[np.linalg.norm(points, axis=1) <= radius - r_max]
+    if len(centers) == 0:
+        raise ValueError(f'The patch of radius {radius} has no points farther than r_max = {r_max} from its edge')
+    centers = centers[_compact_order(centers, chunk)]
+    counts = np.zeros(bins)
+    for s in range(0, len(centers), chunk):
+        r = cKDTree(centers[s:s + chunk]).sparse_distance_matrix(tree, r_max, output_type='ndarray')['v']
+        r = r[r > 0]
+        counts += np.bincount(np.minimum((r * (bins / r_max)).astype(np.int64), bins - 1), minlength=bins)
+
+    ## the density of the region of the centers, the edge of a patch that is not a full disk does not lower it
+    density = len(centers) / (np.pi * (radius - r_max)**2)
+    shells = np.pi * np.diff(edges**2)
+    return (edges[:-1] + edges[1:]) / 2, counts / (len(centers) * density * shells)
+
+def _canonical(codes):
+    ## smallest integer code of the cyclic sequences in the rows of codes over all rotations and reflections, the digits are
+    # the codes of the angles (1 triangle, 2 square, 3 other)
+    d = codes.shape[1]
+    variants = []
+    for seq in (codes, codes[:, ::-1]):
+        for shift in range(d):
+            rolled = np.roll(seq, shift, axis=1)
+            variants.append(rolled @ (4 ** np.arange(d - 1, -1, -1)))
+    return np.min(np.stack(variants), axis=0)
+
+def _config_name(code, degree):
+    digits = [(code // 4**k) % 4 for k in range(degree - 1, -1, -1)]
+    return '.'.join({1: '3', 2: '4'}.get(int(digit), '?') for digit in digits)
+
+def bond_statistics(points, bond_max=1.2, chunk=8192, length_bins=60, angle_bins=180, tree=None, radius=None):
+    """
+    Histograms of the bond lengths and of the angles between neighbouring bonds around a vertex and the counts of the vertex
+    configurations. The bonds are the pairs closer than bond_max, the angles and configurations are taken only at the vertices
+    whose neighbours are all inside the patch. Returns a dictionary ready for JSON
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        bond_max (float) - largest bond length, between the side and the short diagonal of the tiles
+        chunk (int) - number of points handled at once
+        length_bins (int) - number of bins of the bond lengths in (0, bond_max]
+        angle_bins (int) - number of bins of the angles in (0, 360]
+        tree (scipy.spatial.cKDTree) - KD-tree of the points, built if not given
+        radius (float) - radius of the patch, the largest distance of a point from the origin by default
+    """
+    tree = tree or cKDTree(points)
+    norms = np.linalg.norm(points, axis=1)
+    radius = radius or np.max(norms)
+    length_edges = np.linspace(0, bond_max, length_bins + 1)
+    angle_edges = np.linspace(0, 360, angle_bins + 1)
+    lengths = np.zeros(length_bins, dtype=np.int64)
+    angles = np.zeros(angle_bins, dtype=np.int64)
+    configs = {}
+
+    order = _compact_order(points, chunk)
+    for s in range(0, len(points), chunk):
+        ## bonds of the chunk as rows (center, neighbour, length), each bond is counted once at the center with the lower index
+        block = cKDTree(points[order[s:s + chunk]]).sparse_distance_matrix(tree, bond_max, output_type='ndarray')
+        block = block[block['v'] > 0]
+        center = order[s + block['i']]
+        neighbour = block['j']
+        once = center < neighbour
+        lengths += np.histogram(block['v'][once], length_edges)[0]
+
+        ## the bonds of the interior vertices sorted by the vertex and the direction, the angle of the last bond closes the circle
+        interior = norms[center] <= radius - bond_max
+        if not interior.any():
+            continue
+        center, neighbour = center[interior], neighbour[interior]
+        d = points[neighbour] - points[center]
+        direction = np.degrees(np.arctan2(d[:, 1], d[:, 0])) % 360
+        by_vertex = np.lexsort((direction, center))
+        center, direction = center[by_vertex], direction[by_vertex]
+        first = np.flatnonzero(np.r_[True, center[1:] != center[:-1]])
+        degree = np.diff(np.r_[first, len(center)])
+        following = np.roll(direction, -1)
+        last = first + degree - 1
+        following[last] = direction[first] + 360
+        angle = following - direction
+        angles += np.histogram(angle, angle_edges)[0]
+
+        ## vertex configurations, the angles are sorted into triangles (60), squares (90) and others
+        code = np.select([np.abs(angle - 60) < 5, np.abs(angle - 90) < 5], [1, 2], 3)
+        owner = np.repeat(np.arange(len(first)), degree)
+        position = np.arange(len(center)) - np.repeat(first, degree)
+        for deg in np.unique(degree):
+            vertices = np.flatnonzero(degree == deg)
+            table = np.empty((len(vertices), deg), dtype=np.int64)
+            rows = np.isin(owner, vertices)
+            table[np.searchsorted(vertices, owner[rows]), position[rows]] = code[rows]
+            keys, counts = np.unique(_canonical(table), return_counts=True)
+            for key, count in zip(keys, counts):
+                name = _config_name(key, deg)
+                configs[name] = configs.get(name, 0) + int(count)
+
+    return {
+        'bond_length': {'edges': length_edges.tolist(), 'counts': lengths.tolist()},
+        'bond_angle': {'edges': angle_edges.tolist(), 'counts': angles.tolist()},
+        'vertex_configurations': dict(sorted(configs.items(), key=lambda item: -item[1])),
+    }
+
+def analyze_points(points, r_max=5, bins=250, bond_max=1.2, chunk=8192):
+    """
+    g(r) and the bond statistics of one point set as a dictionary ready for JSON
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        r_max (float) - largest distance of g(r)
+        bins (int) - number of bins of g(r)
+        bond_max (float) - largest bond length
+        chunk (int) - number of points handled at once, the memory grows with chunk times the neighbours within r_max
+    """
+    points = np.asarray(points, dtype=np.float64)
+    tree = cKDTree(points)
+    radius = np.max(np.linalg.norm(points, axis=1))
+    r, g = pair_correlation(points, r_max, bins, chunk, tree, radius)
+    result = {'points': len(points), 'radius': float(radius), 'g': {'r': r.tolist(), 'g': g.tolist()}}
+    result.update(bond_statistics(points, bond_max, chunk, tree=tree, radius=radius))
+    return result
+
+def run_batch(point_files, reference=False, a=1, r_max=5, bins=250, bond_max=1.2, chunk=8192):
+    """
+    Analyzes every point file and, with reference, the hexagonal grid of the same size, returns the results by file
+
+    Parameters:
+        point_files (list) - paths of the .npy point files
+        reference (Boolean) - analyzes also the hexagonal grid cropped to the disk of each file
+        a (float) - lattice parameter of the hexagonal grid
+        r_max (float) - largest distance of g(r)
+        bins (int) - number of bins of g(r)
+        bond_max (float) - largest bond length
+        chunk (int) - number of points handled at once
+    """
+    import point_io as pio
+    results = {}
+    for point_file in point_files:
+        points, _ = pio.load_points(point_file)
+        results[point_file] = {'points': analyze_points(points, r_max, bins, bond_max, chunk)}
+        if reference:
+            import lattices as lt
+            hex_points = lt.hexagonal(results[point_file]['points']['radius'], a)
+            results[point_file]['hex'] = analyze_points(hex_points, r_max, bins, bond_max, chunk)
+        top = list(results[point_file]['points']['vertex_configurations'].items())[:3]
+        print(f'{point_file}: {len(points)} points, vertex configurations {top}')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pair correlation and bond statistics of the point files')
+    parser.add_argument('files', nargs='*', help='.npy point files, all files of the points folder by default')
+    parser.add_argument('--output', default='pair_correlation.json')
+    parser.add_argument('--reference', action='store_true', help='analyze also the hexagonal grid of each file')
+    parser.add_argument('--r-max', type=float, default=5)
+    parser.add_argument('--bins', type=int, default=250)
+    parser.add_argument('--bond-max', type=float, default=1.2)
+    parser.add_argument('--chunk', type=int, default=8192)
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        import point_io as pio
+        pio.convert_folder("points")
+        files = sorted(glob.glob(os.path.join("points", "*.npy")))
+    with open(args.output, 'w') as f:
+        json.dump(run_batch(files, args.reference, r_max=args.r_max, bins=args.bins, bond_max=args.bond_max,
+                            chunk=args.chunk), f)
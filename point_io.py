@@ -0,0 +1,97 @@
+import os
+import glob
+import json
+import numpy as np
+
+## This part of code stores the point sets in a binary format, the points are saved already deduplicated and sorted as a .npy
+# file that can be memory mapped, the metadata (side length, cycles, deduplication precision, bounding box) is saved next to it
+# in a small .json file with the same name
+
+
+def meta_path(path):
+    """
+    Path of the metadata file belonging to a point file
+
+    Parameters:
+        path (str) - path of the .npy point file
+    """
+    return os.path.splitext(path)[0] + '.json'
+
+def save_points(path, points, side=None, cycles=None, decimals=3):
+    """
+    Deduplicates the points in the same way as main.py does after loading (rounding and np.unique) and saves them with the
+    metadata, both files are written atomically
+
+    Parameters:
+        path (str) - path of the .npy point file
+        points (numpy.ndarray) - points to be saved
+        side (float) - lattice parameter used for the generation
+        cycles (int) - number of generation cycles
+        decimals (int) - accuracy of the deduplication based on numbers after decimal point
+    """
+    points = np.unique(np.round(np.asarray(points, dtype=float), decimals), axis=0)
+    meta = {
+        'count': int(points.shape[0]),
+        'side': side,
+        'cycles': cycles,
+        'decimals': decimals,
+        'bbox': [float(points[:, 0].min()), float(points[:, 0].max()),
+                 float(points[:, 1].min()), float(points[:, 1].max())] if len(points) else None,
+        'max_radius': float(np.max(np.linalg.norm(points, axis=1))) if len(points) else None,
+    }
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, points)
+    os.replace(tmp_path, path)
+
+    tmp_path = meta_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path(path))
+    return points, meta
+
+def load_points(path, mmap=True):
+    """
+    Opens a point file saved by save_points, returns the points (memory mapped by default) and the metadata
+
+    Parameters:
+        path (str) - path of the .npy point file
+        mmap (Boolean) - memory maps the points instead of reading them
+    """
+    points = np.load(path, mmap_mode='r' if mmap else None)
+    meta = {}
+    if os.path.exists(meta_path(path)):
+        with open(meta_path(path)) as f:
+            meta = json.load(f)
+    return points, meta
+
+def convert_txt(txt_file, side=None, cycles=None, decimals=3):
+    """
+    Converts a .txt point file from the points folder to the binary format, the .npy file is written next to it
+
+    Parameters:
+        txt_file (str) - path of the .txt point file
+        side (float) - lattice parameter used for the generation
+        cycles (int) - number of generation cycles
+        decimals (int) - accuracy of the deduplication based on numbers after decimal point
+    """
+    path = os.path.splitext(txt_file)[0] + '.npy'
+    save_points(path, np.loadtxt(txt_file, delimiter=","), side, cycles, decimals)
+    return path
+
+def convert_folder(folder='points', overwrite=False):
+    """
+    Converts all .txt point files in a folder that do not have a binary version yet
+
+    Parameters:
+        folder (str) - folder with the point files
+        overwrite (Boolean) - converts also the files that already have a binary version
+    """
+    converted = []
+    for txt_file in sorted(glob.glob(os.path.join(folder, "*.txt"))):
+        path = os.path.splitext(txt_file)[0] + '.npy'
+        if overwrite or not os.path.exists(path):
+            converted.append(convert_txt(txt_file))
+            print(f'Converted {txt_file} to {path}')
+    return converted
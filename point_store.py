@@ -0,0 +1,168 @@
+import numpy as np
+
+## Array backed set of points for the incremental generation. Every point has an integer key, its coordinates rounded to a given
+# number of decimals (the same rounding as generate_mesh_bcup2.dedup_preserve_order), and the keys are held in a dictionary, so
+# inserting a point that is not stored yet and removing a point are O(1). The store also keeps the order of the points by their
+# distance from the origin, the new points are merged into it by binary search instead of sorting all points again, and a
+# coarse grid of cells for neighbour lookups
+
+
+class PointStore:
+    """
+    Set of points with exact deduplication on rounded coordinates, order by the distance from the origin and neighbour lookups
+
+    Parameters:
+        points (numpy.ndarray) - initial points of shape (M, 2), inserted in their order
+        decimals (int) - accuracy of the deduplication based on numbers after decimal point
+        cell (float) - side of the cells of the neighbour grid, about the lattice parameter
+    """
+
+    def __init__(self, points=None, decimals=6, cell=1.0):
+        self.decimals = decimals
+        self.cell = cell
+        self._scale = 10.0 ** decimals
+        self._xy = np.empty((64, 2))
+        self._radius = np.empty(64)
+        self._alive = np.zeros(64, dtype=bool)
+        self._size = 0
+        ## key -> slot of the point, cell -> slots of the points inside
+        self._index = {}
+        self._cells = {}
+        ## slots of the alive points sorted by the distance from the origin, ties keep the order of insertion
+        self._order = np.empty(0, dtype=np.int64)
+        if points is not None:
+            self.insert(points)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, point):
+        return self._key(point) in self._index
+
+    def _key(self, point):
+        ## the same rounding as np.round(point, decimals)
+        return tuple(np.rint(np.asarray(point, dtype=np.float64) * self._scale).astype(np.int64).tolist())
+
+    def _cell(self, point):
+        return tuple(np.floor(np.asarray(point) / self.cell).astype(np.int64).tolist())
+
+    def _grow(self, size):
+        capacity = len(self._alive)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self._xy = np.resize(self._xy, (capacity, 2))
+        self._radius = np.resize(self._radius, capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+
+    def insert(self, points):
+        """
+        Inserts the points that are not stored yet, the first of several equal points wins. Returns the mask of the inserted
+        points
+
+        Parameters:
+            points (numpy.ndarray) - points of shape (M, 2)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        keys = np.rint(points * self._scale).astype(np.int64).tolist()
+        cells = np.floor(points / self.cell).astype(np.int64).tolist()
+        inserted = np.zeros(len(points), dtype=bool)
+        self._grow(self._size + len(points))
+
+        slot = self._size
+        for i, (key, cell) in enumerate(zip(map(tuple, keys), map(tuple, cells))):
+            if key in self._index:
+                continue
+            self._index[key] = slot
+            self._cells.setdefault(cell, []).append(slot)
+            inserted[i] = True
+            slot += 1
+
+        new = np.arange(self._size, slot)
+        self._xy[new] = points[inserted]
+        self._radius[new] = np.linalg.norm(points[inserted], axis=1)
+        self._alive[new] = True
+        self._size = slot
+
+        ## merge of the new slots into the order, a stable sort of the few new points and a binary search in the old ones
+        new = new[np.argsort(self._radius[new], kind='stable')]
+        position = np.searchsorted(self._radius[self._order], self._radius[new], side='right')
+        self._order = np.insert(self._order, position, new)
+        return inserted
+
+    def _drop(self, slots):
+        for slot in slots:
+            point = self._xy[slot]
+            del self._index[self._key(point)]
+            members = self._cells[self._cell(point)]
+            members.remove(slot)
+            if not members:
+                del self._cells[self._cell(point)]
+        self._alive[slots] = False
+
+    def remove(self, point):
+        """
+        Removes the stored point equal to point after the rounding, returns False if there is none
+
+        Parameters:
+            point (numpy.ndarray) - point of shape (2,)
+        """
+        slot = self._index.get(self._key(point))
+        if slot is None:
+            return False
+        self._drop([slot])
+        self._order = self._order[self._order != slot]
+        return True
+
+    def pop_closest(self, n):
+        """
+        Removes the n points closest to the origin and returns them
+
+        Parameters:
+            n (int) - number of removed points
+        """
+        slots = self._order[:n]
+        points = self._xy[slots]
+        self._drop(slots)
+        self._order = self._order[n:]
+        return points
+
+    @property
+    def points(self):
+        """
+        Stored points in the order of insertion
+        """
+        return self._xy[:self._size][self._alive[:self._size]]
+
+    def ordered(self):
+        """
+        Stored points sorted by the distance from the origin, the same order as quasi_tiling.sort_by_distance_from_origin
+        up to the order of points at the same distance
+        """
+        return self._xy[self._order]
+
+    def radii(self):
+        """
+        Distances of the stored points from the origin in the order of ordered()
+        """
+        return self._radius[self._order]
+
+    def neighbours(self, point, radius):
+        """
+        Stored points closer to point than radius, in the order of insertion
+
+        Parameters:
+            point (numpy.ndarray) - point of shape (2,)
+            radius (float) - radius of the lookup
+        """
+        point = np.asarray(point, dtype=np.float64)
+        low = np.floor((point - radius) / self.cell).astype(np.int64)
+        high = np.floor((point + radius) / self.cell).astype(np.int64)
+        slots = [slot for cx in range(low[0], high[0] + 1) for cy in range(low[1], high[1] + 1)
+                 for slot in self._cells.get((cx, cy), ())]
+        slots = np.sort(np.array(slots, dtype=np.int64))
+        near = self._xy[slots]
+        return near[np.linalg.norm(near - point, axis=1) < radius]
@@ -0,0 +1,125 @@
+import numpy as np
+from scipy.ndimage import map_coordinates
+import structure_factor as sf
+
+## This part of code samples the diffraction pattern of the Gaussian decorated points on a polar grid (|k|, theta) instead of the
+# Cartesian grid of the FFT. The generated point sets are built from copies of a tile rotated by 60 degrees, and |S(-k)| = |S(k)|
+# for real points, so the magnitude repeats every 360/order degrees. Only one wedge of the polar grid is evaluated with
+# structure_factor.spectrum and the full pattern is the wedge repeated around the circle, which divides the cost by the order.
+# The symmetry has to hold for the whole input: the hexagonal grid cropped to a disk (lattices.hexagonal) has it, but the
+# rectangular grid of generate_mesh_bcup2.hexagonal does not (6-fold deviation 0.18) and the sigma phase approximant is only
+# 4-fold. By default a second wedge is evaluated and an input that breaks the symmetry raises an error
+
+
+def polar_grid(k_max, n_k=256, n_theta=64, order=6, k_min=0):
+    """
+    Radii and the angles of one wedge of the polar grid, the angles of the wedge are [0, 360/order) without its end, so the
+    repeated wedges join without a doubled angle
+
+    Parameters:
+        k_max (float) - largest |k|
+        n_k (int) - number of radii
+        n_theta (int) - number of angles in one wedge
+        order (int) - order of the rotational symmetry
+        k_min (float) - smallest |k|
+    """
+    k = np.linspace(k_min, k_max, n_k)
+    theta = np.arange(n_theta) * (2 * np.pi / order / n_theta)
+    return k, theta
+
+def wedge_magnitude(points, sig, k, theta, offset=0, chunk=1024):
+    """
+    |F(k)| of the Gaussian decorated points on the polar grid k x (theta + offset) of shape (len(k), len(theta))
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        sig (float) - standard deviation of the Gaussians
+        k (numpy.ndarray) - radii of the grid
+        theta (numpy.ndarray) - angles of the grid in radians
+        offset (float) - rotation of the angles in radians
+        chunk (int) - number of wave vectors evaluated at once, the temporary array has the size chunk*P
+    """
+    angle = theta + offset
+    kv = np.stack((np.outer(k, np.cos(angle)), np.outer(k, np.sin(angle))), axis=-1).reshape(-1, 2)
+    F = sf.gauss_envelope(kv[:, 0], kv[:, 1], sig) * sf.structure_factor(points, kv, chunk)
+    return np.abs(F).reshape(len(k), len(theta))
+
+def polar_spectrum(points, sig, k_max, n_k=256, n_theta=64, order=6, k_min=0, check=True, chunk=1024, tol=1e-3):
+    """
+    |F(k)| on the full polar grid of shape (n_k, order*n_theta) built from one evaluated wedge. Returns the magnitude, the
+    radii, the angles of the full grid in radians and the largest difference between the first and the second wedge relative
+    to the maximum of the first one if check is True (None otherwise). Raises ValueError if the deviation is above tol, the
+    repeated wedge would not be the pattern of the points
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        sig (float) - standard deviation of the Gaussians
+        k_max (float) - largest |k|
+        n_k (int) - number of radii
+        n_theta (int) - number of angles in one wedge
+        order (int) - order of the rotational symmetry, 6 for the generated tilings and the hexagonal grid
+        k_min (float) - smallest |k|
+        check (Boolean) - evaluates also the second wedge to validate the symmetry, doubles the cost
+        chunk (int) - number of wave vectors evaluated at once
+        tol (float) - largest accepted relative deviation of the second wedge, it allows for points saved with rounded
+                      coordinates (about 5e-5 for the .txt files)
+    """
+    k, theta = polar_grid(k_max, n_k, n_theta, order, k_min)
+    wedge = wedge_magnitude(points, sig, k, theta, 0, chunk)
+
+    deviation = None
+    if check:
+        second = wedge_magnitude(points, sig, k, theta, 2 * np.pi / order, chunk)
+        deviation = float(np.max(np.abs(second - wedge)) / np.max(wedge))
+        if deviation > tol:
+            raise ValueError(f'The points do not have the {order}-fold symmetry, the second wedge deviates by {deviation:.3g}')
+
+    theta_full = np.arange(order * n_theta) * (2 * np.pi / order / n_theta)
+    return np.tile(wedge, (1, order)), k, theta_full, deviation
+
+def radial_profile(mag):
+    """
+    Mean intensity over the angles at every radius of a polar magnitude
+
+    Parameters:
+        mag (numpy.ndarray) - polar magnitude of shape (n_k, n_theta) from polar_spectrum
+    """
+    return mag.mean(axis=1)
+
+def angular_profile(mag, k, k_range=None):
+    """
+    Mean intensity over the radii inside k_range at every angle of a polar magnitude
+
+    Parameters:
+        mag (numpy.ndarray) - polar magnitude of shape (n_k, n_theta) from polar_spectrum
+        k (numpy.ndarray) - radii of the grid
+        k_range (tuple) - (k0, k1) band of radii, all radii by default
+    """
+    if k_range is None:
+        return mag.mean(axis=0)
+    band = (k >= k_range[0]) & (k <= k_range[1])
+    return mag[band].mean(axis=0)
+
+def to_cartesian(mag, k, theta, kx, ky):
+    """
+    Interpolates the polar magnitude onto the Cartesian grid kx x ky of shape (len(ky), len(kx)) for plotting, the wave
+    vectors outside the radii of the grid are 0
+
+    Parameters:
+        mag (numpy.ndarray) - polar magnitude of the full circle from polar_spectrum
+        k (numpy.ndarray) - evenly spaced radii of the grid
+        theta (numpy.ndarray) - evenly spaced angles of the full circle
+        kx (numpy.ndarray) - x components of the Cartesian grid
+        ky (numpy.ndarray) - y components of the Cartesian grid
+    """
+    KX, KY = np.meshgrid(kx, ky)
+    r = np.hypot(KX, KY)
+    phi = np.arctan2(KY, KX) % (2 * np.pi)
+
+    ## the first angle is appended after the last one so that the interpolation wraps around the circle
+    closed = np.concatenate((mag, mag[:, :1]), axis=1)
+    rows = (r - k[0]) / (k[1] - k[0])
+    cols = phi / (theta[1] - theta[0])
+    out = map_coordinates(closed, [rows.ravel(), cols.ravel()], order=1, mode='nearest').reshape(r.shape)
+    out[(r < k[0]) | (r > k[-1])] = 0
+    return out
@@ -7,6 +7,11 @@ import numpy as np
 # one additional point from the top of the equilateral triangle in direction of 
 # the two points chosen from the square
 
+## Matrices of the rotations by 60, 120, ..., 360 degrees used by rotated_points
+_t = np.pi/3
+_rot_mat = np.array([[np.cos(_t),-np.sin(_t)],[np.sin(_t), np.cos(_t)]])
+ROTATIONS = np.stack([np.linalg.matrix_power(_rot_mat, i+1) for i in range(6)])
+
 
 def build_points2(p,a):
     """
@@ -118,18 +123,17 @@ def build_points(p,a,invert):
 
 def rotated_points(points):
     """
-    Rotates input points with respect to hexagonal symetry around the origin
+    Rotates input points with respect to hexagonal symetry around the origin, the input points are followed by their
+    rotations by 60, 120, ..., 360 degrees. Works on a single (M, 2) array or a stack (..., M, 2) of them
 
     Parameters:
         points (numpy.ndarray) - input points
     """
-    t = np.pi/3
-    rr = points.shape[0]
-    rot_mat = np.array([[np.cos(t),-np.sin(t)],[np.sin(t), np.cos(t)]])
-    for i in range(6):
-        for p in range(rr):
-            points = np.vstack((points,np.linalg.matrix_power(rot_mat,i+1) @ points[p,:]))
-    return points
+    ## all six rotations are applied in one matrix product, the order of the output is the same as appending the rotated
+    # points rotation by rotation
+    rotated = points[..., None, :, :] @ np.swapaxes(ROTATIONS, 1, 2)
+    rotated = rotated.reshape(points.shape[:-2] + (-1, 2))
+    return np.concatenate((points, rotated), axis=-2)
 
 def sort_by_distance_from_origin(points):
     """
@@ -140,3 +144,114 @@ def sort_by_distance_from_origin(points):
     """
     return points[np.argsort(np.linalg.norm(points, axis=1))]
 
+
+def triplet_sides(a, square):
+    """
+    Side lengths of the triplets accepted by build_points2 (square) or build_points, two sides of length a and the long one
+
+    Parameters:
+        a (int, float) - side length of the lattice
+        square (Boolean) - sides of build_points2 instead of build_points
+    """
+    return np.array([a, a, np.sqrt(2) if square else a * 2 * np.sin(np.radians(75))])
+
+def _triplet_frame(p, a, expected):
+    """
+    Common part of the batched point generation, checks the side lengths of each triplet and finds its peak point, the
+    midpoint and the vector between the two side points and the unit vector from the peak to the midpoint
+
+    Parameters:
+        p (numpy.ndarray) - stacked triplets of shape (K, 3, 2)
+        a (int, float) - side length of the lattice
+        expected (numpy.ndarray) - expected side lengths of the triplet
+    """
+    rr = np.stack((p[:, 0] - p[:, 1], p[:, 0] - p[:, 2], p[:, 1] - p[:, 2]), axis=1)
+    r = np.sqrt(np.sum(rr**2, axis=2))
+
+    ## same check as np.allclose of the sorted side lengths in the single triplet versions
+    e = np.sort(expected)
+    signature = np.all(np.abs(np.sort(r, axis=1) - e) <= 1e-8 + 1e-5 * np.abs(e), axis=1)
+
+    ## the peak is opposite to the last side that is not of length a, the side n connects the points other than 2-n
+    other = np.round(r, 3) != a
+    signature &= other.any(axis=1)
+    n = 2 - np.argmax(other[:, ::-1], axis=1)
+    k = np.arange(p.shape[0])
+    peak = p[k, 2 - n]
+    midpoint = (p[k, np.where(n != 0, 2, 0)] + p[k, np.abs(1 - n)]) / 2
+    hyp = rr[k, n]
+
+    ## triplets of the wrong shape get a dummy direction so that the rest of the computation stays finite
+    d = midpoint - peak
+    norm = np.sqrt(np.sum(d**2, axis=1))
+    norm[norm == 0] = 1
+    mp = d / norm[:, None]
+    forward = (mp @ np.array([1, 1])) >= 0
+
+    return signature, forward, peak, midpoint, hyp, mp
+
+def _unit(v):
+    ## rowwise normalization that leaves zero vectors untouched
+    norm = np.sqrt(np.sum(v**2, axis=-1, keepdims=True))
+    return v / np.where(norm == 0, 1, norm)
+
+def build_points2_batch(p, a):
+    """
+    Batched version of build_points2, returns the points of all tiles (K, 8, 2), their peaks (K, 2), the validity mask (K,)
+    and the mask of the triplets that had the correct side lengths but were oriented backwards (K,)
+
+    Parameters:
+        p (numpy.ndarray) - stacked triplets of shape (K, 3, 2)
+        a (int, float) - side length of the lattice
+    """
+    long =  (1+np.sqrt(3))*a/2
+    dia = np.sqrt(2)
+    signature, forward, peak, midpoint, hyp, mp = _triplet_frame(p, a, triplet_sides(a, True))
+
+    p1 = peak + dia*mp
+
+    short = np.sqrt(2)/2*a
+    hp = _unit(hyp)
+
+    p2 = midpoint - short*hp
+    p5 = midpoint + short*hp
+
+    yy = _unit(peak - p5)
+    xx = _unit(peak - p2)
+
+    p7 = midpoint + yy*long
+    p6 = midpoint - yy*long
+    p4 = midpoint + xx*long
+    p3 = midpoint - xx*long
+
+    tiles = np.stack((peak,p7,p2,p3,p1,p6,p5,p4), axis=1)
+    return tiles, peak, signature & forward, signature & ~forward
+
+def build_points_batch(p, a, invert):
+    """
+    Batched version of build_points, returns the points of all tiles (K, 8, 2), their peaks (K, 2), the validity mask (K,)
+    and the mask of the triplets that had the correct side lengths but were oriented backwards (K,)
+
+    Parameters:
+        p (numpy.ndarray) - stacked triplets of shape (K, 3, 2)
+        a (int, float) - side length of the lattice
+        invert (int) - 1 or -1 deciding the orientation of the geometry
+    """
+    long =  a * 2 * np.sin(np.radians(75))
+    signature, forward, peak, midpoint, hyp, mp = _triplet_frame(p, a, triplet_sides(a, False))
+
+    p1 = peak + long*mp
+
+    short = a*np.cos(np.radians(75))
+    hp = invert * _unit(hyp)
+    a0 = (p1+peak)/2
+
+    p2 = a0+hp*short
+    p3 = a0-hp*(long-short)
+    p0 = midpoint - invert * hyp/2
+    p4 = p0 + _unit(p2-peak)*a
+    p5 = p4 - mp*long
+    p6 = p0 + hp*long
+
+    tiles = np.stack((peak,p5,p0,p3,p4,p1,p2,p6), axis=1)
+    return tiles, peak, signature & forward, signature & ~forward
@@ -0,0 +1,67 @@
+import numpy as np
+import add_gauss as ag
+import structure_factor as sf
+import zoom_spectrum as zs
+import fft_stage as fs
+import bragg_peaks as bp
+import result_cache as rc
+import lattices as lt
+
+## Computing part of batch_render without any plotting: the hexagonal reference grid and the map, zoomed spectrum and Bragg peaks
+# of one (points, sigma, N). It imports neither matplotlib nor shapely, so the worker processes of cli.py that only extract peaks
+# start fast
+
+
+def hex_reference(points, meta, a=1):
+    """
+    Hexagonal grid covering the same disk as the points, the same grid as in main.py
+
+    Parameters:
+        points (numpy.ndarray) - input points
+        meta (dict) - metadata of the point file from point_io.load_points
+        a (float) - lattice parameter of the hexagonal grid
+    """
+    maxdist = int(np.floor(meta.get('max_radius') or np.max(np.linalg.norm(points, axis=1))))
+    H = 2 * maxdist
+    D = int(np.floor(4*maxdist/np.sqrt(3)))
+    return lt.hexagonal_rect(D, H, a)
+
+def map_and_zoomed_fft(points, sigma, N, backend='stencil', spectrum_mode='fft', zoom_mode='crop', cache=None):
+    """
+    Computes the Gaussian map of the points, the zoomed magnitude of its FFT with the modes of main.py and the table of its
+    Bragg peaks from bragg_peaks.extract_peaks
+
+    Parameters:
+        points (numpy.ndarray) - input points
+        sigma (float) - standard deviation of added Gaussians
+        N (int) - Number of values in one principal direction of the map
+        backend (str) - rendering backend of add_gauss.add_points
+        spectrum_mode (str) - 'fft' or 'direct'
+        zoom_mode (str) - 'crop' or 'czt'
+        cache (result_cache.ResultCache) - cache of the results, nothing is cached if None
+    """
+    if cache is not None:
+        key = rc.cache_key(rc.point_hash(points), 'map_and_zoomed_fft', sigma=sigma, N=N, buffer=ag.BUFFER, backend=backend,
+                           spectrum_mode=spectrum_mode, zoom_mode=zoom_mode, precision='float64',
+                           peak_threshold=bp.THRESHOLD_RATIO, peak_fields=list(bp.PEAK_DTYPE.names))
+
+        def compute():
+            map, extent, fft_zoom, peaks = map_and_zoomed_fft(points, sigma, N, backend, spectrum_mode, zoom_mode)
+            return {'map': map, 'extent': np.array(extent), 'fft_zoom': fft_zoom, 'peaks': peaks}
+
+        arrays = cache.get_or_compute(key, compute)
+        return arrays['map'], tuple(arrays['extent'].tolist()), arrays['fft_zoom'], arrays['peaks']
+
+    map, x, y, extent = ag.add_points(points, sigma, N, backend)
+    if zoom_mode == 'czt':
+        fft_zoom, fx, fy = zs.zoomed_spectrum(map, x, y)
+        kx, ky = sf.fft_kgrid(x, y)
+        peaks = bp.extract_peaks(fft_zoom, 2 * np.pi * fx, 2 * np.pi * fy, spacing=max(kx[1] - kx[0], ky[1] - ky[0]))
+    else:
+        if spectrum_mode == 'direct':
+            fft_mag = sf.fft_magnitude(points, sigma, x, y)
+        else:
+            fft_mag = fs.shifted_magnitude(map, workers=1)
+        fft_zoom = fft_mag[zs.dynamic_zoom_region(fft_mag)]
+        peaks = bp.extract_peaks(fft_mag, *sf.fft_kgrid(x, y))
+    return map, extent, fft_zoom, peaks
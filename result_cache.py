@@ -0,0 +1,151 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+## On disk cache of the computed maps and spectra. An entry is addressed by the hash of the point array and of the parameters
+# of the computation (sigma, N, buffer, backend, precision, ...), so a changed point file or parameter gives a new key and
+# an unchanged one is found again in the next run. Every entry is a folder with one .npy file per array, which is loaded
+# memory mapped, or one compressed .npz file. The entries are written into a temporary folder and renamed, so a reader never
+# sees a half written entry, and the least recently used entries are deleted when the cache gets bigger than its limit
+
+
+def point_hash(points):
+    """
+    Content hash of a point array, the same for equal arrays loaded from different files
+
+    Parameters:
+        points (numpy.ndarray) - input points
+    """
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    digest = hashlib.sha256(str(points.shape).encode())
+    digest.update(points.tobytes())
+    return digest.hexdigest()
+
+def cache_key(points_hash, kind, **params):
+    """
+    Key of a cached result from the hash of the points, the kind of the result and its parameters
+
+    Parameters:
+        points_hash (str) - hash of the points from point_hash
+        kind (str) - name of the computation
+        params - parameters of the computation, they have to be JSON serializable
+    """
+    text = json.dumps({'points': points_hash, 'kind': kind, 'params': params}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def _folder_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class ResultCache:
+    """
+    Content addressed cache of dictionaries of numpy arrays with least recently used eviction
+
+    Parameters:
+        folder (str) - folder of the cache
+        max_bytes (int) - largest total size of the entries, the least recently used ones are deleted above it
+        compress (Boolean) - stores the entries as compressed .npz files instead of memory mapped .npy files
+    """
+
+    def __init__(self, folder='cache', max_bytes=2 * 10**9, compress=False):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.compress = compress
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key)
+
+    def get(self, key):
+        """
+        Returns the dictionary of arrays stored under key or None, the .npy arrays are memory mapped read only
+
+        Parameters:
+            key (str) - key from cache_key
+        """
+        path = self._path(key)
+        try:
+            ## the time of the last use is the modification time of the folder
+            os.utime(path)
+            names = os.listdir(path)
+            if 'arrays.npz' in names:
+                with np.load(os.path.join(path, 'arrays.npz')) as data:
+                    return {name: data[name] for name in data.files}
+            return {os.path.splitext(name)[0]: np.load(os.path.join(path, name), mmap_mode='r') for name in names}
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, arrays):
+        """
+        Stores the dictionary of arrays under key and evicts the least recently used entries above the size limit, an entry
+        that is already stored (e.g. by another process) is kept
+
+        Parameters:
+            key (str) - key from cache_key
+            arrays (dict) - arrays of the result by name
+        """
+        path = self._path(key)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        os.makedirs(tmp_path, exist_ok=True)
+        if self.compress:
+            np.savez_compressed(os.path.join(tmp_path, 'arrays.npz'), **arrays)
+        else:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.asarray(array))
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the arrays stored under key, or computes them with compute(), stores and returns them
+
+        Parameters:
+            key (str) - key from cache_key
+            compute (function) - function without arguments returning the dictionary of arrays
+        """
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = compute()
+            self.put(key, arrays)
+        return arrays
+
+    def entries(self):
+        """
+        List of (last use time, size in bytes, key) of the stored entries from the least recently used
+        """
+        entries = []
+        for entry in os.scandir(self.folder):
+            if not entry.is_dir() or '.tmp' in entry.name:
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, _folder_size(entry.path), entry.name))
+            except FileNotFoundError:
+                continue
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the total size is within max_bytes, returns the deleted keys
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        deleted = []
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+            deleted.append(key)
+        return deleted
+
+    def clear(self):
+        """
+        Deletes all entries
+        """
+        for _, _, key in self.entries():
+            shutil.rmtree(self._path(key), ignore_errors=True)
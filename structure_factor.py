@@ -0,0 +1,188 @@
+import numpy as np
+from scipy.fft import rfft2, irfft2, rfftfreq
+import add_gauss as ag
+import fft_stage as fs
+
+## This part of code computes the diffraction pattern of the Gaussian decorated points directly from the points, without the
+# real space map. The Fourier transform of a sum of Gaussians of width sig centered at the points r_j is
+#     F(k) = exp(-sig^2 |k|^2 / 2) * S(k),   S(k) = sum_j exp(-i k.r_j)
+# so only the structure factor S(k) of the points has to be evaluated, which is done by chunked vectorized summation
+
+
+def gauss_envelope(kx, ky, sig):
+    """
+    Fourier transform of a normalized 2D Gaussian with standard deviation sig
+
+    Parameters:
+        kx (numpy.ndarray) - x components of the wave vectors
+        ky (numpy.ndarray) - y components of the wave vectors
+        sig (float) - standard deviation of the Gaussians
+    """
+    return np.exp(-sig**2 * (kx**2 + ky**2) / 2)
+
+def structure_factor(points, k, chunk=1024):
+    """
+    Evaluates the structure factor S(k) of the points at an arbitrary list of wave vectors (type-3 non-uniform transform)
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        k (numpy.ndarray) - wave vectors of shape (K, 2)
+        chunk (int) - number of wave vectors evaluated at once, the temporary array has the size chunk*P
+    """
+    k = np.atleast_2d(k)
+    S = np.empty(k.shape[0], dtype=complex)
+    for s in range(0, k.shape[0], chunk):
+        S[s:s + chunk] = np.exp(-1j * (k[s:s + chunk] @ points.T)).sum(axis=1)
+    return S
+
+def structure_factor_grid(points, kx, ky, chunk=2048):
+    """
+    Evaluates the structure factor on the rectangular grid kx x ky (type-1 non-uniform transform), exp(-i k.r) is separable
+    in the two directions so the whole grid is a single complex matrix product over the points. The result has the shape
+    (len(ky), len(kx)) same as the maps from add_gauss
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        kx (numpy.ndarray) - x components of the grid
+        ky (numpy.ndarray) - y components of the grid
+        chunk (int) - number of points in one matrix product
+    """
+    S = np.zeros((len(ky), len(kx)), dtype=complex)
+    for s in range(0, points.shape[0], chunk):
+        p = points[s:s + chunk]
+        S += np.exp(-1j * np.outer(ky, p[:, 1])) @ np.exp(-1j * np.outer(p[:, 0], kx))
+    return S
+
+def spectrum(points, sig, k=None, kx=None, ky=None):
+    """
+    Fourier transform of the Gaussian decorated points, either at a list of wave vectors k or on the grid kx x ky
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        sig (float) - standard deviation of the Gaussians
+        k (numpy.ndarray) - wave vectors of shape (K, 2)
+        kx (numpy.ndarray) - x components of the grid, used when k is not given
+        ky (numpy.ndarray) - y components of the grid, used when k is not given
+    """
+    if k is not None:
+        k = np.atleast_2d(k)
+        return gauss_envelope(k[:, 0], k[:, 1], sig) * structure_factor(points, k)
+    if kx is None or ky is None:
+        raise ValueError("Either k or both kx and ky have to be given")
+    return gauss_envelope(kx[None, :], ky[:, None], sig) * structure_factor_grid(points, kx, ky)
+
+def fft_kgrid(x, y):
+    """
+    Wave vectors of np.fft.fftshift(fft2(map)) for a map sampled on the evenly spaced coordinates x and y
+
+    Parameters:
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+    """
+    dx = (x[-1] - x[0]) / (len(x) - 1)
+    dy = (y[-1] - y[0]) / (len(y) - 1)
+    kx = 2 * np.pi * np.fft.fftshift(np.fft.fftfreq(len(x), d=dx))
+    ky = 2 * np.pi * np.fft.fftshift(np.fft.fftfreq(len(y), d=dy))
+    return kx, ky
+
+def fft_magnitude(points, sig, x, y):
+    """
+    Direct replacement of np.abs(np.fft.fftshift(fft2(map))) of the map from add_gauss.add_points, evaluated on the same
+    wave vectors and scaled by 1/(dx*dy) like the discrete transform but without the map and its aliasing
+
+    Parameters:
+        points (numpy.ndarray) - input points of shape (P, 2)
+        sig (float) - standard deviation of the Gaussians
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+    """
+    kx, ky = fft_kgrid(x, y)
+    dx = (x[-1] - x[0]) / (len(x) - 1)
+    dy = (y[-1] - y[0]) / (len(y) - 1)
+    return np.abs(spectrum(points, sig, kx=kx, ky=ky)) / (dx * dy)
+
+def sweep_references(sigmas, x, y, method='render'):
+    """
+    Reference width from which sigma_sweep derives the map of every sigma on the grid x, y, or None for a sigma whose map is
+    rendered on its own because the grid does not resolve it. For method 'render' the reference is the smallest resolved
+    sigma of the list and a sigma is resolved from the grid spacing h on. For method 'direct' the reference is 0 (the
+    structure factor of the points) and the map is the inverse transform of a spectrum cut at the Nyquist frequency pi/h,
+    where the Gaussian envelope is exp(-pi^2 sig^2 / (2 h^2)), so a sigma is resolved from 2h on (below 3e-9)
+
+    Parameters:
+        sigmas (list) - standard deviations of the Gaussians
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+        method (str) - 'render' or 'direct', see sigma_sweep
+    """
+    h = max((x[-1] - x[0]) / (len(x) - 1), (y[-1] - y[0]) / (len(y) - 1))
+    if method == 'render':
+        resolved = [sig for sig in sigmas if sig >= h]
+        sig0 = min(resolved) if resolved else None
+    elif method == 'direct':
+        h = 2 * h
+        sig0 = 0
+    else:
+        raise ValueError(f"Unknown method '{method}', choose from ['render', 'direct']")
+    return [sig0 if sig >= h else None for sig in sigmas]
+
+def sigma_sweep(points, sigmas, N, backend='stencil', method='render', workers=-1, single=False):
+    """
+    Generates the Gaussian maps and the shifted FFT magnitudes for all sigmas while transforming the points only once.
+    Yields (sigma, (map, x, y, extent), fft_mag) in the order of sigmas, the counterpart of add_points followed by
+    np.abs(np.fft.fftshift(fft2(map))). Gaussians convolve into Gaussians, so the spectrum of width sig is the spectrum of
+    width sig0 multiplied by exp(-(sig^2 - sig0^2) |k|^2 / 2) and the map is its inverse transform. This only holds for the
+    sampled maps when the grid resolves the Gaussians of width sig0, the aliasing of the reference spectrum is about
+    exp(-2 pi^2 sig0^2 / h^2) for the grid spacing h (below 3e-9 for h <= sig0) but reaches tens of percent when sig0 is
+    a fraction of h. The references are given by sweep_references: for method 'render' the reference is the smallest sigma
+    that is not smaller than the grid spacing and the smaller sigmas are rendered and transformed separately, exactly like
+    add_points. For method 'direct' the spectra are always the exact ones, but the inverse transform of a spectrum is only the
+    real space map when the grid resolves sigma, so the maps of the smaller sigmas are rendered like add_points
+
+    Parameters:
+        points (numpy.ndarray) - input points
+        sigmas (list) - standard deviations of the Gaussians
+        N (int) - Number of values in one principal direction of the map, the same for all sigmas
+        backend (str) - rendering backend of add_gauss for the reference map and the maps below the grid spacing
+        method (str) - 'render' renders the map once with the reference sigma and transforms it, 'direct' evaluates the
+                       structure factor of the points on the FFT grid instead (no aliasing in the spectrum, slower for
+                       many points)
+        workers (int) - number of threads of the transforms, -1 uses all cores
+        single (Boolean) - computes the transforms in float32 instead of float64
+    """
+    x, y, extent = ag.map_grid(points, N)
+    dx = (x[-1] - x[0]) / (len(x) - 1)
+    dy = (y[-1] - y[0]) / (len(y) - 1)
+    k2 = fs.rfft_k2(x, y)
+    dtype = np.float32 if single else np.float64
+    references = sweep_references(sigmas, x, y, method)
+    sig0 = next((ref for ref in references if ref is not None), None)
+
+    ## Spectrum F0 of the reference width sig0, computed once as the real input half spectrum, scaled like fft2 of the map
+    map0 = F0 = None
+    if method == 'render' and sig0 is not None:
+        map0 = ag.BACKENDS[backend](points, sig0, x, y).astype(dtype, copy=False)
+        F0 = rfft2(map0, workers=workers)
+    elif method == 'direct':
+        sig0 = 0
+        kx = 2 * np.pi * rfftfreq(len(x), d=dx)
+        ky = 2 * np.pi * np.fft.fftfreq(len(y), d=dy)
+        F0 = (structure_factor_grid(points - np.array([x[0], y[0]]), kx, ky) / (dx * dy)).astype(np.complex64 if single else np.complex128)
+
+    for sig, ref in zip(sigmas, references):
+        if method == 'render' and ref is None:
+            ## the grid does not resolve this width, so it cannot be derived from a reference and is rendered on its own
+            map = ag.BACKENDS[backend](points, sig, x, y).astype(dtype, copy=False)
+            F = rfft2(map, workers=workers)
+        elif sig == sig0 and map0 is not None:
+            F = F0
+            map = map0
+        else:
+            F = F0 * np.exp(-(sig**2 - sig0**2) * k2 / 2).astype(dtype, copy=False)
+            if ref is None:
+                ## exact spectrum of the direct method, but the band limited inverse transform is not the map of this width
+                map = ag.BACKENDS[backend](points, sig, x, y).astype(dtype, copy=False)
+            else:
+                map = irfft2(F, s=(len(y), len(x)), workers=workers)
+        print(f'Gaussians added for parameters sigma = {sig} and N = {N}')
+        yield sig, (map, x, y, extent), fs.hermitian_shift(np.abs(F), (len(y), len(x)))
@@ -0,0 +1,31 @@
+import numpy as np
+import render_stage as rs
+import lattices as lt
+import result_cache as rc
+
+
+def test_map_and_zoomed_fft_miss_then_hit(tmp_path):
+    points = lt.hexagonal(8)
+    cache = rc.ResultCache(str(tmp_path / 'cache'))
+    expected = rs.map_and_zoomed_fft(points, 0.1, 300)
+
+    miss = rs.map_and_zoomed_fft(points, 0.1, 300, cache=cache)
+    assert len(cache.entries()) == 1
+    hit = rs.map_and_zoomed_fft(points, 0.1, 300, cache=cache)
+    assert isinstance(hit[0], np.memmap)
+
+    for result in (miss, hit):
+        assert result[1] == tuple(expected[1])
+        np.testing.assert_array_equal(result[0], expected[0])
+        np.testing.assert_array_equal(result[2], expected[2])
+        np.testing.assert_array_equal(result[3], expected[3])
+
+def test_eviction_keeps_the_most_recent_entry(tmp_path):
+    cache = rc.ResultCache(str(tmp_path / 'cache'), max_bytes=10**9)
+    keys = [rc.cache_key(rc.point_hash(np.zeros((i + 1, 2))), 'test') for i in range(3)]
+    for key in keys:
+        cache.put(key, {'a': np.zeros(1000)})
+    cache.get(keys[0])
+    cache.max_bytes = 9000
+    assert sorted(cache.evict()) == sorted(keys[1:])
+    assert [key for _, _, key in cache.entries()] == keys[:1]
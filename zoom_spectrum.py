@@ -0,0 +1,96 @@
+import numpy as np
+from scipy.signal import zoom_fft
+import fft_stage as fs
+
+## This part of code zooms the FT of the Gaussian maps onto the region with the main peaks. Instead of computing a bigger full FFT
+# and cropping it, the window is found from a cheap low resolution pass and only the window is computed at high resolution
+# with the chirp-z transform (scipy.signal.zoom_fft), one axis after the other
+
+
+def dynamic_zoom_region(arr, threshold_ratio=0.1, padding=10):
+    ## Zoomes the FT to a range at which the main peaks are realized with a certain threshold ratio relative to the maximum value
+    max_val = np.max(arr)
+    mask = arr > (threshold_ratio * max_val)
+    coords = np.argwhere(mask)
+
+    if coords.size == 0:
+        # fallback to center square crop if no peaks found
+        center = np.array(arr.shape) // 2
+        half_size = min(arr.shape) // 10
+        return tuple(slice(center[i] - half_size, center[i] + half_size) for i in range(2))
+
+    top_left = np.maximum(coords.min(axis=0) - padding, 0)
+    bottom_right = np.minimum(coords.max(axis=0) + padding, np.array(arr.shape))
+
+    height = bottom_right[0] - top_left[0]
+    width = bottom_right[1] - top_left[1]
+    side = max(height, width)
+
+    center = (top_left + bottom_right) // 2
+    half_side = side // 2
+
+    start = np.maximum(center - half_side, 0)
+    end = np.minimum(start + side, np.array(arr.shape))
+
+    start = np.maximum(end - side, 0)
+
+    return tuple(slice(start[i], end[i]) for i in range(2))
+
+def peak_window(map, x, y, step=4, threshold_ratio=0.1, padding=10):
+    """
+    Finds the frequency window of the main peaks from a low resolution pass, the FFT of the central 1/step part of the map
+    covers the same frequency range as the full FFT but with step times coarser sampling. Returns the ranges (fx0, fx1) and
+    (fy0, fy1) in cycles per unit length, the same units as np.fft.fftfreq(N, d=dx)
+
+    Parameters:
+        map (numpy.ndarray) - Gaussian map from add_gauss.add_points
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+        step (int) - coarsening of the frequency sampling in the low resolution pass
+        threshold_ratio (float) - threshold of the peaks relative to the maximum
+        padding (int) - padding of the window in pixels of the full resolution FFT
+    """
+    dx = (x[-1] - x[0]) / (len(x) - 1)
+    dy = (y[-1] - y[0]) / (len(y) - 1)
+
+    ## central crop of the map
+    ny, nx = map.shape
+    cy, cx = max(ny // step, 2), max(nx // step, 2)
+    sy, sx = (ny - cy) // 2, (nx - cx) // 2
+    low = fs.shifted_magnitude(map[sy:sy + cy, sx:sx + cx])
+
+    zoom_slice = dynamic_zoom_region(low, threshold_ratio, max(padding // step, 1))
+
+    fy = np.fft.fftshift(np.fft.fftfreq(cy, d=dy))
+    fx = np.fft.fftshift(np.fft.fftfreq(cx, d=dx))
+    wy = fy[zoom_slice[0]]
+    wx = fx[zoom_slice[1]]
+    return (wx[0], wx[-1]), (wy[0], wy[-1])
+
+def zoomed_spectrum(map, x, y, M=None, step=4, threshold_ratio=0.1, padding=10):
+    """
+    Magnitude of the FT of the map only inside the peak window, sampled with M x M points by the chirp-z transform.
+    Returns the magnitude of shape (M, M) with the same scaling as np.abs(fft2(map)) and the sampled frequencies fx, fy
+
+    Parameters:
+        map (numpy.ndarray) - Gaussian map from add_gauss.add_points
+        x (numpy.ndarray) - x coordinates of the map
+        y (numpy.ndarray) - y coordinates of the map
+        M (int) - number of samples along each direction of the window, the size of the map by default
+        step (int) - coarsening of the frequency sampling in the low resolution pass
+        threshold_ratio (float) - threshold of the peaks relative to the maximum
+        padding (int) - padding of the window in pixels of the full resolution FFT
+    """
+    dx = (x[-1] - x[0]) / (len(x) - 1)
+    dy = (y[-1] - y[0]) / (len(y) - 1)
+    M = M or max(map.shape)
+
+    (fx0, fx1), (fy0, fy1) = peak_window(map, x, y, step, threshold_ratio, padding)
+
+    ## the 2D transform is separable, first along x then along y, the intermediate array has the size N x M
+    spec = zoom_fft(map, [fx0, fx1], M, fs=1 / dx, endpoint=True, axis=1)
+    spec = zoom_fft(spec, [fy0, fy1], M, fs=1 / dy, endpoint=True, axis=0)
+
+    fx = np.linspace(fx0, fx1, M)
+    fy = np.linspace(fy0, fy1, M)
+    return np.abs(spec), fx, fy